@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# compare.py
+# Compara dos resultados de run.py (p. ej. el commit base y el actual) y
+# marca como regresión las latencias que suben o el throughput que baja más
+# del umbral. Sale con código 1 si hay alguna, para usarlo en CI.
+#
+#   python compare.py results/base.json results/nuevo.json --threshold 0.10
+import sys
+import json
+import argparse
+
+LATENCY_KEYS = ("p50", "p95", "p99")
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before
+
+
+def compare_scenario(name, base, new, threshold):
+    """Filas (métrica, antes, después, cambio, regresión) de un escenario."""
+    rows = []
+    for key in LATENCY_KEYS:
+        before = (base.get("latency_ms") or {}).get(key)
+        after = (new.get("latency_ms") or {}).get(key)
+        delta = change(before, after)
+        rows.append((f"latency {key} (ms)", before, after, delta, delta is not None and delta > threshold))
+    delta = change(base.get("throughput_rps"), new.get("throughput_rps"))
+    rows.append(("throughput (rps)", base.get("throughput_rps"), new.get("throughput_rps"),
+                 delta, delta is not None and delta < -threshold))
+    # Las etapas se muestran por la mediana y no cuentan como regresión:
+    # ayudan a ver dónde está el cambio
+    stages = sorted(set(base.get("stages_ms") or {}) | set(new.get("stages_ms") or {}))
+    for stage in stages:
+        before = ((base.get("stages_ms") or {}).get(stage) or {}).get("p50")
+        after = ((new.get("stages_ms") or {}).get(stage) or {}).get("p50")
+        rows.append((f"  {stage} p50 (ms)", before, after, change(before, after), False))
+    rows.append(("errors", base.get("errors"), new.get("errors"), None,
+                 (new.get("errors") or 0) > (base.get("errors") or 0)))
+    return rows
+
+
+def fmt(value):
+    if value is None:
+        return "-"
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmarks/run.py")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Cambio relativo a partir del cual se marca una regresión")
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    print(f"base:  {base.get('commit')}{' (dirty)' if base.get('dirty') else ''}  {base.get('timestamp')}")
+    print(f"nuevo: {new.get('commit')}{' (dirty)' if new.get('dirty') else ''}  {new.get('timestamp')}")
+    ignored = ("scenarios",)
+    differing = sorted(k for k in set(base["config"]) | set(new["config"])
+                       if k not in ignored and base["config"].get(k) != new["config"].get(k))
+    if differing:
+        print(f"Aviso: configuración distinta en {', '.join(differing)}; los números no son comparables del todo")
+
+    regressions = 0
+    for name in sorted(set(base["scenarios"]) & set(new["scenarios"])):
+        print(f"\n[{name}]")
+        for metric, before, after, delta, regression in compare_scenario(
+                name, base["scenarios"][name], new["scenarios"][name], args.threshold):
+            pct = f"{delta * 100:+.1f}%" if delta is not None else ""
+            flag = "  REGRESIÓN" if regression else ""
+            print(f"  {metric:24s} {fmt(before):>10s} {fmt(after):>10s} {pct:>8s}{flag}")
+            regressions += regression
+    for name in sorted(set(base["scenarios"]) ^ set(new["scenarios"])):
+        print(f"\n[{name}] solo está en uno de los dos resultados")
+
+    print(f"\n{regressions} regresiones (umbral {args.threshold:.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
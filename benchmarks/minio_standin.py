@@ -0,0 +1,130 @@
+# minio_standin.py
+# Sustituto local de MinIO para los benchmarks: implementa en memoria el
+# subconjunto de la API S3 que usa el cliente minio de los servicios (buckets,
+# put/get de objetos y subida multipart). No valida firmas.
+import hashlib
+import threading
+from xml.sax.saxutils import escape
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+STREAM_CHUNK_SIZE = 256 * 1024
+
+app = FastAPI(title="MinIO stand-in")
+_lock = threading.Lock()
+_buckets = {}
+_uploads = {}
+_stats = {"put_bytes": 0, "get_bytes": 0, "objects": 0}
+
+
+def xml_response(tag, fields, status_code=200):
+    body = "".join(f"<{k}>{escape(str(v))}</{k}>" for k, v in fields.items())
+    return Response(
+        f'<?xml version="1.0" encoding="UTF-8"?><{tag} xmlns="{S3_NAMESPACE}">{body}</{tag}>',
+        status_code=status_code, media_type="application/xml"
+    )
+
+
+def s3_error(code, message, resource, status_code):
+    return xml_response("Error", {"Code": code, "Message": message, "Resource": resource,
+                                  "RequestId": "standin", "HostId": "standin"}, status_code)
+
+
+def etag_of(data):
+    return hashlib.md5(data).hexdigest()
+
+
+@app.get("/minio/health/live")
+def health():
+    return {"status": "ok"}
+
+
+@app.get("/standin/stats")
+def stats():
+    return _stats
+
+
+@app.api_route("/{bucket}", methods=["HEAD", "PUT", "GET", "DELETE"])
+async def bucket_api(bucket: str, request: Request):
+    if request.method == "PUT":
+        with _lock:
+            _buckets.setdefault(bucket, {})
+        return Response(headers={"Location": f"/{bucket}"})
+    if bucket not in _buckets:
+        return s3_error("NoSuchBucket", "The specified bucket does not exist", f"/{bucket}", 404)
+    if request.method == "HEAD":
+        return Response()
+    if request.method == "DELETE":
+        with _lock:
+            _buckets.pop(bucket, None)
+        return Response(status_code=204)
+    if "location" in request.query_params:
+        # Cadena vacía = us-east-1
+        return xml_response("LocationConstraint", {})
+    return s3_error("NotImplemented", "Operación no soportada por el stand-in", f"/{bucket}", 501)
+
+
+@app.api_route("/{bucket}/{key:path}", methods=["HEAD", "PUT", "GET", "POST", "DELETE"])
+async def object_api(bucket: str, key: str, request: Request):
+    resource = f"/{bucket}/{key}"
+    objects = _buckets.get(bucket)
+    if objects is None:
+        return s3_error("NoSuchBucket", "The specified bucket does not exist", resource, 404)
+    params = request.query_params
+
+    if request.method == "POST" and "uploads" in params:
+        upload_id = hashlib.sha256(f"{resource}{id(request)}".encode("utf-8")).hexdigest()
+        with _lock:
+            _uploads[upload_id] = {"content_type": request.headers.get("content-type"), "parts": {}}
+        return xml_response("InitiateMultipartUploadResult",
+                            {"Bucket": bucket, "Key": key, "UploadId": upload_id})
+
+    upload_id = params.get("uploadId")
+    if upload_id is not None:
+        upload = _uploads.get(upload_id)
+        if upload is None:
+            return s3_error("NoSuchUpload", "The specified upload does not exist", resource, 404)
+        if request.method == "PUT":
+            data = await request.body()
+            upload["parts"][int(params["partNumber"])] = data
+            _stats["put_bytes"] += len(data)
+            return Response(headers={"ETag": f'"{etag_of(data)}"'})
+        if request.method == "DELETE":
+            _uploads.pop(upload_id, None)
+            return Response(status_code=204)
+        # CompleteMultipartUpload: se unen las partes en orden
+        with _lock:
+            _uploads.pop(upload_id, None)
+        data = b"".join(upload["parts"][n] for n in sorted(upload["parts"]))
+        etag = etag_of(data)
+        objects[key] = (data, upload["content_type"] or "application/octet-stream", etag)
+        _stats["objects"] += 1
+        return xml_response("CompleteMultipartUploadResult",
+                            {"Location": resource, "Bucket": bucket, "Key": key, "ETag": f'"{etag}"'})
+
+    if request.method == "PUT":
+        data = await request.body()
+        etag = etag_of(data)
+        objects[key] = (data, request.headers.get("content-type", "application/octet-stream"), etag)
+        _stats["put_bytes"] += len(data)
+        _stats["objects"] += 1
+        return Response(headers={"ETag": f'"{etag}"'})
+
+    if key not in objects:
+        return s3_error("NoSuchKey", "The specified key does not exist.", resource, 404)
+    data, content_type, etag = objects[key]
+    if request.method == "DELETE":
+        objects.pop(key, None)
+        return Response(status_code=204)
+    headers = {"ETag": f'"{etag}"', "Content-Length": str(len(data))}
+    if request.method == "HEAD":
+        return Response(headers=headers, media_type=content_type)
+
+    def body():
+        for i in range(0, len(data), STREAM_CHUNK_SIZE):
+            yield data[i:i + STREAM_CHUNK_SIZE]
+        _stats["get_bytes"] += len(data)
+
+    return StreamingResponse(body(), headers=headers, media_type=content_type)
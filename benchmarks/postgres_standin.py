@@ -0,0 +1,196 @@
+# postgres_standin.py
+# Sustituto local de PostgreSQL para los benchmarks: una conexión DB-API en
+# memoria que reemplaza a psycopg2.connect dentro del proceso del servicio, de
+# modo que el pool de db.py, las consultas y los commits se ejecutan igual que
+# en producción pero sin servidor. Solo entiende las sentencias que recorren
+# los flujos medidos (pre-ping, cola upload_jobs e INSERT de clasificaciones);
+# el resto (DDL, migraciones, locks) se acepta sin efecto.
+#
+# Para medir contra un PostgreSQL real basta con no instalarlo (run.py --postgres).
+import os
+import re
+import time
+import threading
+from datetime import datetime, timedelta
+
+# Latencia simulada (ms) por sentencia, como el viaje de ida y vuelta a la BD
+POSTGRES_STANDIN_LATENCY_MS = float(os.getenv("POSTGRES_STANDIN_LATENCY_MS", 0.5))
+
+_lock = threading.Lock()
+_jobs = {}
+_migrations = set()
+_users = {}
+_clasificaciones_jobs = set()
+_stats = {"statements": 0, "commits": 0, "clasificaciones": 0}
+
+
+def _normalize(sql):
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    return re.sub(r"\s+", " ", sql).strip().lower()
+
+
+def _value(param):
+    # psycopg2.extras.Json guarda el objeto original en .adapted
+    return getattr(param, "adapted", param)
+
+
+def stats():
+    with _lock:
+        return dict(_stats, upload_jobs=len(_jobs))
+
+
+class _Info:
+    # psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    transaction_status = 0
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+        self.description = None
+        self._rows = []
+        self._mogrified = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def mogrify(self, template, args):
+        # execute_values compone el INSERT multi-fila con mogrify: solo se
+        # cuenta cuántas filas lleva
+        self._mogrified += 1
+        return b"(NULL)"
+
+    def execute(self, sql, params=None):
+        if POSTGRES_STANDIN_LATENCY_MS:
+            time.sleep(POSTGRES_STANDIN_LATENCY_MS / 1000)
+        rows_in_statement = self._mogrified or 1
+        self._mogrified = 0
+        params = [_value(p) for p in (params or ())]
+        with _lock:
+            _stats["statements"] += 1
+            self._rows = self._run(_normalize(sql), params, rows_in_statement)
+        self.rowcount = len(self._rows)
+
+    def _run(self, sql, params, rows_in_statement):
+        now = datetime.now()
+        if sql.startswith("select 1"):
+            return [(1,)]
+
+        if sql.startswith("insert into upload_jobs"):
+            job_id, username, filename, content_type, object_name = params
+            _jobs[job_id] = {
+                "id": job_id, "username": username, "filename": filename,
+                "content_type": content_type, "object_name": object_name,
+                "estado": "pendiente", "resultado": None, "error": None,
+                "intentos": 0, "creado_en": now, "actualizado_en": now, "disponible_en": now,
+            }
+            return []
+        if sql.startswith("select") and "from upload_jobs where id" in sql:
+            job = _jobs.get(str(params[0]))
+            if job is None:
+                return []
+            return [tuple(job[c] for c in ("id", "username", "filename", "estado", "resultado",
+                                           "error", "creado_en", "actualizado_en"))]
+        if sql.startswith("update upload_jobs set estado = 'procesando'"):
+            pending = [j for j in _jobs.values()
+                       if j["estado"] == "pendiente" and j["disponible_en"] <= now]
+            if not pending:
+                return []
+            job = min(pending, key=lambda j: j["creado_en"])
+            job.update(estado="procesando", intentos=job["intentos"] + 1, actualizado_en=now)
+            return [tuple(job[c] for c in ("id", "username", "filename", "content_type",
+                                           "object_name", "intentos"))]
+        if sql.startswith("update upload_jobs set estado = case"):
+            max_attempts, _, timeout = params
+            limit = now - timedelta(seconds=timeout)
+            for job in _jobs.values():
+                if job["estado"] == "procesando" and job["actualizado_en"] < limit:
+                    failed = job["intentos"] >= max_attempts
+                    job.update(estado="error" if failed else "pendiente", actualizado_en=now,
+                               error="Tiempo de procesamiento agotado" if failed else job["error"])
+            return []
+        if sql.startswith("update upload_jobs set estado = 'pendiente'"):
+            error, delay, job_id = params
+            job = _jobs.get(str(job_id))
+            if job is not None:
+                job.update(estado="pendiente", error=error, actualizado_en=now,
+                           disponible_en=now + timedelta(seconds=delay))
+            return []
+        if sql.startswith("update upload_jobs set estado = %s"):
+            estado, resultado, error, job_id = params
+            job = _jobs.get(str(job_id))
+            if job is not None:
+                job.update(estado=estado, resultado=resultado, error=error, actualizado_en=now)
+            return []
+
+        if sql.startswith("insert into clasificaciones"):
+            if "on conflict (job_id)" in sql:
+                # Una fila por trabajo de subida
+                if params[0] in _clasificaciones_jobs:
+                    return []
+                _clasificaciones_jobs.add(params[0])
+            _stats["clasificaciones"] += rows_in_statement
+            return []
+        if sql.startswith("select version from schema_migrations"):
+            return [(v,) for v in sorted(_migrations)]
+        if sql.startswith("insert into schema_migrations"):
+            _migrations.add(params[0])
+            return []
+        if sql.startswith("insert into usuarios") and params:
+            _users.setdefault(params[0], tuple(params))
+            return []
+        if sql.startswith("select username, password_hash, rol from usuarios"):
+            user = _users.get(params[0])
+            return [user] if user else []
+        # DDL, advisory locks, migraciones...: sin efecto
+        return []
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        self._rows = []
+
+
+class Connection:
+    encoding = "UTF8"
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.info = _Info()
+
+    def cursor(self, *args, **kwargs):
+        return Cursor(self)
+
+    def commit(self):
+        with _lock:
+            _stats["commits"] += 1
+
+    def rollback(self):
+        pass
+
+    def get_transaction_status(self):
+        return _Info.transaction_status
+
+    def close(self):
+        self.closed = 1
+
+
+def connect(*args, **kwargs):
+    return Connection()
+
+
+def install():
+    """Reemplaza psycopg2.connect; debe llamarse antes de crear el pool."""
+    import psycopg2
+    psycopg2.connect = connect
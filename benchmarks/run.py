@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# run.py
+# Benchmark de extremo a extremo del pipeline. Levanta los servicios del repo
+# contra stand-ins locales de SMAV, MinIO y PostgreSQL (ver serve.py), lanza
+# /extract-text, /classify-text y el flujo /upload del frontend con la
+# concurrencia indicada y guarda en JSON latencias p50/p95/p99, throughput y
+# desglose por etapas, junto con el commit medido.
+#
+#   python run.py --concurrency 8 --requests 200
+#   python run.py --scenarios classify,upload --concurrency 32 --smav-predict-ms 50
+#   python compare.py results/<antes>.json results/<después>.json
+#
+# La OCR es real: el escenario extract necesita tesseract (y poppler para PDF).
+# Con --postgres se usa el PostgreSQL de las variables POSTGRES_* en lugar del
+# stand-in. El resto de variables de entorno (OCR_WORKERS, UPLOAD_WORKERS,
+# WRITE_BATCH_SIZE...) llegan tal cual a los servicios.
+import os
+import sys
+import hmac
+import json
+import time
+import base64
+import random
+import socket
+import asyncio
+import hashlib
+import argparse
+import platform
+import mimetypes
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+DEFAULT_FILE = os.path.join(ROOT, "test1.png")
+DEFAULT_OUTPUT_DIR = os.path.join(HERE, "results")
+
+SCENARIOS = ("extract", "classify", "upload")
+# Clave JWT con la que arranca el frontend: el benchmark firma su propio token
+BENCH_SECRET_KEY = "bench_secret_key"
+BENCH_USER = "bench"
+STARTUP_TIMEOUT = 90
+# Índices del calentamiento, fuera del rango de las peticiones medidas
+WARMUP_OFFSET = 10 ** 6
+
+WORDS = (
+    "factura contrato fecha importe cliente proveedor documento total pago "
+    "servicio dirección referencia número cuenta entrega pedido firma anexo"
+).split()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return sha, bool(status.strip())
+
+
+def percentile(sorted_values, q):
+    # Interpolación lineal entre rangos, como numpy.percentile
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(seconds):
+    """Resumen en milisegundos de una lista de duraciones en segundos."""
+    values = sorted(s * 1000 for s in seconds)
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 0.50), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "p99": round(percentile(values, 0.99), 2),
+        "mean": round(sum(values) / len(values), 2),
+        "min": round(values[0], 2),
+        "max": round(values[-1], 2),
+    }
+
+
+def make_token(username, rol, secret):
+    """JWT HS256 con el mismo payload que create_token del frontend."""
+    def b64(data):
+        return base64.urlsafe_b64encode(data).rstrip(b"=")
+    header = b64(json.dumps({"alg": "HS256", "typ": "JWT"}).encode("utf-8"))
+    payload = b64(json.dumps({"sub": username, "rol": rol,
+                              "exp": int(time.time()) + 24 * 3600}).encode("utf-8"))
+    signing_input = header + b"." + payload
+    signature = b64(hmac.new(secret.encode("utf-8"), signing_input, hashlib.sha256).digest())
+    return (signing_input + b"." + signature).decode("ascii")
+
+
+def unique_payload(data, i, salt):
+    # Bytes extra tras el final del PNG/PDF: el documento se decodifica igual
+    # pero su hash cambia, así que la caché de OCR no responde por él
+    return data + f"\n%bench-{salt}-{i}\n".encode("ascii")
+
+
+def text_for(i):
+    rng = random.Random(i)
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 80))) + f" doc-{i}"
+
+
+class Stack:
+    """Procesos de los servicios y stand-ins; cada uno escribe su log en log_dir."""
+
+    def __init__(self, log_dir, fake_postgres=True):
+        self.log_dir = log_dir
+        self.fake_postgres = fake_postgres
+        self.urls = {}
+        self._procs = []
+
+    def start(self, name, env=None, ready_path="/"):
+        port = free_port()
+        cmd = [sys.executable, os.path.join(HERE, "serve.py"), name, "--port", str(port)]
+        if self.fake_postgres and name in ("classifier", "frontend"):
+            cmd.append("--fake-postgres")
+        log_path = os.path.join(self.log_dir, f"{name}.log")
+        log = open(log_path, "w")
+        proc = subprocess.Popen(cmd, env={**os.environ, **(env or {})},
+                                stdout=log, stderr=subprocess.STDOUT)
+        self._procs.append((proc, log))
+        url = f"http://127.0.0.1:{port}"
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{name} terminó al arrancar (ver {log_path})")
+            try:
+                if httpx.get(url + ready_path, timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{name} no respondió en {STARTUP_TIMEOUT}s (ver {log_path})")
+            time.sleep(0.2)
+        self.urls[name] = url
+        return url
+
+    def stop(self):
+        for proc, log in reversed(self._procs):
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            log.close()
+        self._procs = []
+
+
+def start_stack(stack, scenarios, args):
+    """Arranca solo lo que necesitan los escenarios pedidos."""
+    env = {"SECRET_KEY": BENCH_SECRET_KEY}
+    need_smav = "classify" in scenarios or "upload" in scenarios
+    if need_smav:
+        stack.start("smav", {
+            "SMAV_STANDIN_PREDICT_MS": str(args.smav_predict_ms),
+            "SMAV_STANDIN_PROCESS_MS": str(args.smav_process_ms),
+        })
+    if "upload" in scenarios:
+        stack.start("minio", ready_path="/minio/health/live")
+        env["MINIO_HOST"] = stack.urls["minio"].split("://", 1)[1]
+    if "extract" in scenarios:
+        stack.start("ocr", env)
+        env["OCR_URL"] = stack.urls["ocr"] + "/extract-text"
+    if need_smav:
+        stack.start("classifier", {**env, "SMAV_URL": stack.urls["smav"] + "/predict"})
+    if "upload" in scenarios:
+        stack.start("frontend", {
+            **env,
+            "SMAV_PROCESS_URL": stack.urls["smav"] + "/process-document",
+            "CLASSIFIER_URL": stack.urls["classifier"] + "/classify-text",
+            "STARTUP_DB_RETRY_DELAY": "0.5",
+        }, ready_path="/ready")
+
+
+async def drive(total, concurrency, request, offset=0):
+    """Lanza request(i) para `total` índices con `concurrency` en vuelo a la vez
+    (lazo cerrado). Devuelve (muestras, errores, segundos)."""
+    samples, errors = [], []
+    indices = iter(range(offset, offset + total))
+
+    async def worker():
+        for i in indices:
+            try:
+                samples.append(await request(i))
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - start
+
+
+def report(samples, errors, elapsed, concurrency):
+    stages = sorted({k for s in samples for k in s["stages"]})
+    return {
+        "requests": len(samples) + len(errors),
+        "ok": len(samples),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 3) if elapsed else None,
+        "latency_ms": summarize([s["latency"] for s in samples]),
+        "stages_ms": {k: summarize([s["stages"][k] for s in samples if k in s["stages"]])
+                      for k in stages},
+    }
+
+
+async def measure(request, args, on_start=None):
+    # El calentamiento usa otros índices para no dejar entradas en las cachés
+    if args.warmup:
+        await drive(args.warmup, args.concurrency, request, offset=WARMUP_OFFSET)
+    if on_start is not None:
+        await on_start()
+    samples, errors, elapsed = await drive(args.requests, args.concurrency, request)
+    return report(samples, errors, elapsed, args.concurrency)
+
+
+async def standin_stats(client, url):
+    response = await client.get(url)
+    response.raise_for_status()
+    return response.json()
+
+
+def smav_summary(stats, endpoint):
+    entry = stats.get(endpoint) or {"requests": 0, "seconds": 0.0}
+    calls = entry["requests"]
+    return {"calls": calls,
+            "mean_ms": round(entry["seconds"] * 1000 / calls, 2) if calls else None}
+
+
+async def bench_extract(client, urls, args):
+    with open(args.file, "rb") as f:
+        data = f.read()
+    filename = os.path.basename(args.file)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    async def request(i):
+        payload = data if args.ocr_cache else unique_payload(data, i, args.salt)
+        start = time.perf_counter()
+        first_page = None
+        ocr_seconds = 0.0
+        pages = 0
+        # ?stream=true: cada línea trae los segundos de OCR de su página
+        async with client.stream("POST", urls["ocr"] + "/extract-text", params={"stream": "true"},
+                                 files={"file": (filename, payload, content_type)}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if "error" in item:
+                    raise RuntimeError(item["error"])
+                if "page" in item:
+                    pages += 1
+                    ocr_seconds += item["seconds"]
+                    if first_page is None:
+                        first_page = time.perf_counter() - start
+        latency = time.perf_counter() - start
+        stages = {"first_page": first_page or latency, "ocr_per_page": ocr_seconds / max(pages, 1)}
+        if pages == 1:
+            # Subida, spool, hash y espera por un worker del pool
+            stages["overhead"] = max(0.0, latency - ocr_seconds)
+        return {"latency": latency, "stages": stages}
+
+    return await measure(request, args)
+
+
+async def bench_classify(client, urls, args):
+    async def request(i):
+        key = i % args.unique_texts if args.unique_texts and i < WARMUP_OFFSET else i
+        start = time.perf_counter()
+        response = await client.post(urls["classifier"] + "/classify-text", json={"text": text_for(key)})
+        response.raise_for_status()
+        body = response.json()
+        if "error" in body:
+            raise RuntimeError(body["error"])
+        return {"latency": time.perf_counter() - start, "stages": {}}
+
+    # Las etapas de esta ruta se ven en agregado: llamadas reales a SMAV (las
+    # demás salieron de la caché) y su latencia media
+    cache_before = {}
+
+    async def on_start():
+        await client.post(urls["smav"] + "/stats/reset")
+        cache_before.update(await standin_stats(client, urls["classifier"] + "/cache/stats"))
+
+    result = await measure(request, args, on_start)
+    cache_after = await standin_stats(client, urls["classifier"] + "/cache/stats")
+    smav = await standin_stats(client, urls["smav"] + "/stats")
+    result["smav_predict"] = smav_summary(smav, "predict")
+    result["prediction_cache"] = {
+        "hits": cache_after["hits"] - cache_before["hits"],
+        "misses": cache_after["misses"] - cache_before["misses"],
+    }
+    return result
+
+
+async def bench_upload(client, urls, args):
+    with open(args.file, "rb") as f:
+        data = f.read()
+    filename = os.path.basename(args.file)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    frontend = urls["frontend"]
+
+    async def request(i):
+        start = time.perf_counter()
+        response = await client.post(
+            frontend + "/upload", headers={"Accept": "application/json"},
+            files={"file": (filename, unique_payload(data, i, args.salt), content_type)}
+        )
+        if response.status_code != 202:
+            raise RuntimeError(f"/upload devolvió HTTP {response.status_code}")
+        job_id = response.json()["job_id"]
+        enqueued = time.perf_counter()
+
+        # El paso de 'pendiente' a 'procesando' se ve con la resolución de --poll-interval
+        claimed = None
+        while True:
+            await asyncio.sleep(args.poll_interval)
+            status = await client.get(f"{frontend}/upload/status/{job_id}")
+            status.raise_for_status()
+            job = status.json()
+            now = time.perf_counter()
+            if job["estado"] != "pendiente" and claimed is None:
+                claimed = now
+            if job["estado"] == "completado":
+                break
+            if job["estado"] == "error":
+                raise RuntimeError(job["error"])
+            if now - start > args.timeout:
+                raise TimeoutError(f"trabajo {job_id} sin terminar tras {args.timeout}s")
+        return {"latency": now - start, "stages": {
+            "enqueue": enqueued - start,
+            "queue_wait": claimed - enqueued,
+            "processing": now - claimed,
+        }}
+
+    async def on_start():
+        await client.post(urls["smav"] + "/stats/reset")
+
+    client.cookies.set("access_token", make_token(BENCH_USER, "usuario", BENCH_SECRET_KEY))
+    result = await measure(request, args, on_start)
+    smav = await standin_stats(client, urls["smav"] + "/stats")
+    result["smav_process_document"] = smav_summary(smav, "process-document")
+    result["smav_predict"] = smav_summary(smav, "predict")
+    if not args.postgres:
+        result["postgres_standin"] = await standin_stats(client, frontend + "/standin/postgres")
+    return result
+
+
+BENCHES = {"extract": bench_extract, "classify": bench_classify, "upload": bench_upload}
+
+
+async def run_scenarios(urls, args):
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency * 2,
+                          max_keepalive_connections=args.concurrency * 2)
+    for name in args.scenarios:
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+            result = await BENCHES[name](client, urls, args)
+        results[name] = result
+        latency = result["latency_ms"] or {}
+        print(f"{name:9s} ok={result['ok']} errores={result['errors']} "
+              f"rps={result['throughput_rps']} p50={latency.get('p50', '-')}ms "
+              f"p95={latency.get('p95', '-')}ms p99={latency.get('p99', '-')}ms")
+        for error in result["error_samples"]:
+            print(f"          {error}")
+    return results
+
+
+def parse_scenarios(value):
+    names = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = [s for s in names if s not in SCENARIOS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"escenarios desconocidos: {', '.join(unknown)}")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo del pipeline")
+    parser.add_argument("--scenarios", type=parse_scenarios, default=list(SCENARIOS),
+                        help="Lista separada por comas: " + ",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8, help="Peticiones en vuelo a la vez")
+    parser.add_argument("--requests", type=int, default=100, help="Peticiones medidas por escenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Peticiones de calentamiento (no se miden)")
+    parser.add_argument("--file", default=DEFAULT_FILE, help="Documento para /extract-text y /upload")
+    parser.add_argument("--unique-texts", type=int, default=0,
+                        help="Textos distintos en classify (0 = todos distintos); "
+                             "con menos textos que peticiones se mide la caché")
+    parser.add_argument("--ocr-cache", action="store_true",
+                        help="Repetir el mismo documento en extract para medir la caché de OCR")
+    parser.add_argument("--smav-predict-ms", type=float, default=20, help="Latencia simulada de SMAV /predict")
+    parser.add_argument("--smav-process-ms", type=float, default=200,
+                        help="Latencia simulada de SMAV /process-document")
+    parser.add_argument("--postgres", action="store_true",
+                        help="Usar el PostgreSQL de POSTGRES_* en lugar del stand-in")
+    parser.add_argument("--poll-interval", type=float, default=0.05,
+                        help="Segundos entre consultas a /upload/status")
+    parser.add_argument("--timeout", type=float, default=120, help="Timeout por petición (s)")
+    parser.add_argument("--output", help="Ruta del JSON de resultados "
+                                         "(por defecto results/<fecha>-<commit>.json)")
+    args = parser.parse_args()
+    args.salt = int(time.time())
+
+    sha, dirty = git_commit()
+    started = datetime.now(timezone.utc)
+    if args.output is None:
+        name = f"{started.strftime('%Y%m%dT%H%M%SZ')}-{(sha or 'nogit')[:10]}{'-dirty' if dirty else ''}.json"
+        args.output = os.path.join(DEFAULT_OUTPUT_DIR, name)
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    log_dir = os.path.join(output_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    stack = Stack(log_dir, fake_postgres=not args.postgres)
+    try:
+        start_stack(stack, args.scenarios, args)
+        results = asyncio.run(run_scenarios(stack.urls, args))
+    finally:
+        stack.stop()
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "salt")}
+    config["file"] = os.path.relpath(args.file, ROOT)
+    # Variables de entorno que cambian el comportamiento de los servicios
+    config["env"] = {k: v for k, v in sorted(os.environ.items())
+                     if k.startswith(("OCR_", "UPLOAD_", "WRITE_", "SMAV_", "DB_POOL_", "PREDICTION_CACHE_", "POSTGRES_STANDIN_"))}
+    document = {
+        "commit": sha,
+        "dirty": dirty,
+        "timestamp": started.isoformat(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "config": config,
+        "scenarios": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
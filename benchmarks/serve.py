@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# serve.py
+# Arranca con uvicorn un servicio del repo o un stand-in en este proceso. Lo
+# usa run.py, pero sirve también para levantar el entorno a mano:
+#
+#   python serve.py smav --port 9100
+#   python serve.py minio --port 9101
+#   python serve.py classifier --port 9102 --fake-postgres
+#
+# Con --fake-postgres se instala postgres_standin antes de importar el
+# servicio y se expone GET /standin/postgres con sus contadores.
+import os
+import sys
+import argparse
+import importlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# nombre -> (directorio, módulo con la app)
+SERVICES = {
+    "ocr": (os.path.join(ROOT, "ocr_service"), "ocr"),
+    "classifier": (os.path.join(ROOT, "classifier_service"), "classifier"),
+    "frontend": (os.path.join(ROOT, "frontend_service"), "main"),
+    "smav": (HERE, "smav_standin"),
+    "minio": (HERE, "minio_standin"),
+}
+
+
+def load_app(name, fake_postgres=False):
+    directory, module_name = SERVICES[name]
+    if fake_postgres:
+        sys.path.insert(0, HERE)
+        import postgres_standin
+        postgres_standin.install()
+    # Los servicios importan sus módulos hermanos y leen plantillas con rutas
+    # relativas: se ejecutan desde su propio directorio
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+    app = importlib.import_module(module_name).app
+    if fake_postgres:
+        app.add_api_route("/standin/postgres", postgres_standin.stats, methods=["GET"])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranca un servicio o stand-in para los benchmarks")
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--fake-postgres", action="store_true",
+                        help="Sustituye PostgreSQL por postgres_standin")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = load_app(args.service, args.fake_postgres)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# smav_standin.py
+# Sustituto local de SMAV para los benchmarks: mismos endpoints y formato de
+# respuesta que usan el clasificador y el frontend, con una latencia simulada
+# configurable y contadores por endpoint para el desglose por etapas.
+import os
+import time
+import random
+import asyncio
+import hashlib
+
+from fastapi import FastAPI, Request, UploadFile, File
+
+# Latencia simulada (ms) de /predict y de /process-document, con un +-JITTER %
+SMAV_STANDIN_PREDICT_MS = float(os.getenv("SMAV_STANDIN_PREDICT_MS", 20))
+SMAV_STANDIN_PROCESS_MS = float(os.getenv("SMAV_STANDIN_PROCESS_MS", 200))
+SMAV_STANDIN_JITTER = float(os.getenv("SMAV_STANDIN_JITTER", 0.2))
+SMAV_STANDIN_SEED = int(os.getenv("SMAV_STANDIN_SEED", 1234))
+SMAV_STANDIN_MODEL_VERSION = os.getenv("SMAV_STANDIN_MODEL_VERSION", "standin-1")
+
+CATEGORIES = ["Factura", "Contrato", "Informe", "Carta", "Formulario"]
+
+app = FastAPI(title="SMAV stand-in")
+_random = random.Random(SMAV_STANDIN_SEED)
+_stats = {}
+
+
+def category_of(data):
+    # Determinista: el mismo texto siempre cae en la misma categoría
+    digest = hashlib.sha256(data).digest()
+    return CATEGORIES[digest[0] % len(CATEGORIES)]
+
+
+async def simulate(endpoint, base_ms):
+    start = time.perf_counter()
+    jitter = 1 + _random.uniform(-SMAV_STANDIN_JITTER, SMAV_STANDIN_JITTER)
+    await asyncio.sleep(max(0.0, base_ms * jitter) / 1000)
+    entry = _stats.setdefault(endpoint, {"requests": 0, "seconds": 0.0})
+    entry["requests"] += 1
+    entry["seconds"] += time.perf_counter() - start
+
+
+@app.get("/")
+def root():
+    return {"message": "SMAV stand-in"}
+
+
+@app.get("/version")
+def version():
+    return {"model_version": SMAV_STANDIN_MODEL_VERSION}
+
+
+@app.post("/predict")
+async def predict(request: Request):
+    data = await request.json()
+    text = data.get("text", "")
+    await simulate("predict", SMAV_STANDIN_PREDICT_MS)
+    return {"categoria_predicha": category_of(text.encode("utf-8")),
+            "model_version": SMAV_STANDIN_MODEL_VERSION}
+
+
+@app.post("/process-document")
+async def process_document(file: UploadFile = File(...)):
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await file.read(256 * 1024)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    await simulate("process-document", SMAV_STANDIN_PROCESS_MS)
+    category = category_of(digest.digest())
+    return {
+        "extracted_text": f"Documento {file.filename} ({size} bytes) {digest.hexdigest()}",
+        "final_category": category,
+        "smav_confidence": 0.9,
+        "classified_file_minio": f"classified-docs/{category}/{file.filename}.txt",
+        "status": "ok",
+    }
+
+
+@app.get("/stats")
+def stats():
+    return _stats
+
+
+@app.post("/stats/reset")
+def stats_reset():
+    _stats.clear()
+    return _stats
@@ -1,72 +1,146 @@
 # classifier.py
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
-import requests
-import psycopg2
-from psycopg2 import OperationalError
+import os
+import asyncio
+import httpx
+from prometheus_client import make_asgi_app
+
+from db import get_conn, close_pool
+from writer import WriteBehindWriter
+from prediction_cache import PredictionCache, text_key
 
 app = FastAPI(title="Classifier Service - Integración SMAV + PostgreSQL")
+app.mount("/metrics", make_asgi_app())
+
 
+SMAV_URL = os.getenv("SMAV_URL", "http://smav_service:8090/predict")
+# Textos que se envían a SMAV a la vez en /classify-batch
+SMAV_BATCH_SIZE = int(os.getenv("SMAV_BATCH_SIZE", 16))
+# Textos por petición en /classify-batch
+CLASSIFY_BATCH_MAX_TEXTS = int(os.getenv("CLASSIFY_BATCH_MAX_TEXTS", 1000))
+SMAV_TIMEOUT = float(os.getenv("SMAV_TIMEOUT", 30))
+SMAV_MAX_CONNECTIONS = int(os.getenv("SMAV_MAX_CONNECTIONS", 100))
+# Endpoint de SMAV que informa de la versión del modelo; sin definir, la caché
+# solo se invalida con la versión que venga en las respuestas de /predict
+SMAV_VERSION_URL = os.getenv("SMAV_VERSION_URL")
+SMAV_VERSION_INTERVAL = float(os.getenv("SMAV_VERSION_INTERVAL", 60))
 
-SMAV_URL = "http://smav_service:8090/predict"
+# Cliente HTTP asíncrono con conexiones keep-alive hacia SMAV (se crea al arrancar)
+smav_client = None
+# Escritura diferida de las clasificaciones (se arranca con el servicio)
+writer = None
+prediction_cache = PredictionCache()
+# Predicciones en curso por clave: textos iguales simultáneos comparten llamada
+_inflight = {}
+_version_task = None
 
 
-DB_CONFIG = {
-    "host": "postgres",
-    "port": "5432",
-    "database": "doc_classifier",
-    "user": "admin",
-    "password": "admin123"
-}
+class SMAVError(RuntimeError):
+    pass
 
 
 def init_db():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS clasificaciones (
-                id SERIAL PRIMARY KEY,
-                texto TEXT,
-                categoria VARCHAR(255),
-                fecha TIMESTAMP
-            )
-        """)
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS clasificaciones (
+                    id SERIAL PRIMARY KEY,
+                    texto TEXT,
+                    categoria VARCHAR(255),
+                    fecha TIMESTAMP
+                )
+            """)
+            conn.commit()
+            cursor.close()
         print(" Tabla 'clasificaciones' verificada o creada correctamente.")
     except Exception as e:
         print(f" Error al inicializar la base de datos: {e}")
 
-def save_to_db(text: str, categoria: str):
-
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO clasificaciones (texto, categoria, fecha)
-            VALUES (%s, %s, %s)
-        """, (text, categoria, datetime.now()))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print(f" Registro guardado correctamente: {categoria}")
-    except OperationalError as e:
-        print(f" Error de conexión con PostgreSQL: {e}")
-    except Exception as e:
-        print(f" Error general al guardar en PostgreSQL: {e}")
-
 @app.on_event("startup")
-def startup_event():
-
-    init_db()
+async def startup_event():
+    global smav_client, writer, _version_task
+    smav_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(SMAV_TIMEOUT, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=SMAV_MAX_CONNECTIONS,
+            max_keepalive_connections=SMAV_MAX_CONNECTIONS,
+        ),
+    )
+    await run_in_threadpool(init_db)
+    writer = WriteBehindWriter()
+    writer.start()
+    if SMAV_VERSION_URL:
+        _version_task = asyncio.create_task(watch_model_version())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _version_task is not None:
+        _version_task.cancel()
+    # Primero se vacía la cola para no perder registros
+    if writer is not None:
+        await writer.stop()
+    if smav_client is not None:
+        await smav_client.aclose()
+    await run_in_threadpool(close_pool)
 
 
 @app.get("/")
 def root():
     return {"message": " Classifier API corriendo e integrada con SMAV y PostgreSQL"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    return prediction_cache.stats()
+
+@app.post("/cache/invalidate")
+def cache_invalidate():
+    prediction_cache.invalidate()
+    return prediction_cache.stats()
+
+
+def model_version_of(result):
+    version = result.get("model_version") or result.get("version")
+    return str(version) if version is not None else None
+
+async def watch_model_version():
+    while True:
+        try:
+            response = await smav_client.get(SMAV_VERSION_URL)
+            if response.status_code == 200:
+                version = model_version_of(response.json())
+                if version is not None:
+                    prediction_cache.set_model_version(version)
+        except Exception as e:
+            print(f" No se pudo consultar la versión del modelo de SMAV: {e}")
+        await asyncio.sleep(SMAV_VERSION_INTERVAL)
+
+async def fetch_prediction(key, text):
+    response = await smav_client.post(SMAV_URL, json={"text": text})
+    if response.status_code != 200:
+        raise SMAVError(f"SMAV devolvió error HTTP {response.status_code}")
+    result = response.json()
+    categoria = result.get("categoria_predicha", "Desconocido")
+    prediction_cache.put(key, categoria, model_version_of(result))
+    return categoria
+
+async def predict_one(text):
+    """Categoría de SMAV para el texto; los textos ya vistos salen de la caché."""
+    key = text_key(text)
+    categoria = prediction_cache.get(key)
+    if categoria is not None:
+        return categoria
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(fetch_prediction(key, text))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: si una petición se cancela, las demás que esperan siguen
+    return await asyncio.shield(task)
+
 @app.post("/classify-text")
 async def classify_text(request: Request):
 
@@ -77,24 +151,72 @@ async def classify_text(request: Request):
         return {"error": " No se recibió texto para clasificar"}
 
     try:
-        # Enviar texto al servicio SMAV
-        response = requests.post(SMAV_URL, json={"text": text})
-
-        if response.status_code == 200:
-            result = response.json()
-            categoria = result.get("categoria_predicha", "Desconocido")
-
-
-            save_to_db(text, categoria)
-
-            print(f" Clasificación exitosa → {categoria}")
-            return {"texto": text[:150], "categoria": categoria}
-        else:
-            error_msg = f" SMAV devolvió error HTTP {response.status_code}"
-            print(error_msg)
-            return {"error": error_msg}
-
+        # Enviar texto al servicio SMAV (o tomarlo de la caché)
+        categoria = await predict_one(text)
+    except SMAVError as e:
+        error_msg = f" {e}"
+        print(error_msg)
+        return {"error": error_msg}
     except Exception as e:
         print(f" Error comunicando con SMAV: {e}")
         return {"error": f"No se pudo conectar con SMAV: {e}"}
 
+    if not await writer.put((text, categoria, datetime.now())):
+        # La cola de escritura está llena (BD caída o lenta): la clasificación
+        # no se guardó
+        return JSONResponse(
+            content={"texto": text[:150], "categoria": categoria,
+                     "error": " No se pudo guardar la clasificación, inténtelo más tarde"},
+            status_code=503
+        )
+
+    print(f" Clasificación exitosa → {categoria}")
+    return {"texto": text[:150], "categoria": categoria}
+
+@app.post("/classify-batch")
+async def classify_batch(data: dict):
+    texts = data.get("texts") or []
+    if not isinstance(texts, list) or not texts:
+        return {"error": " No se recibieron textos para clasificar"}
+    if len(texts) > CLASSIFY_BATCH_MAX_TEXTS:
+        return JSONResponse(
+            content={"error": f" Como máximo {CLASSIFY_BATCH_MAX_TEXTS} textos por petición"},
+            status_code=400
+        )
+
+    resultados = [None] * len(texts)
+    pending = []
+    for i, raw in enumerate(texts):
+        text = raw.strip() if isinstance(raw, str) else ""
+        if text:
+            pending.append((i, text))
+        else:
+            resultados[i] = {"indice": i, "error": "Texto vacío"}
+
+    # SMAV solo expone /predict por texto: cada bloque se envía en paralelo
+    # reutilizando las conexiones keep-alive del cliente
+    to_save = []
+    saved_indices = []
+    for start in range(0, len(pending), SMAV_BATCH_SIZE):
+        chunk = pending[start:start + SMAV_BATCH_SIZE]
+        outcomes = await asyncio.gather(
+            *(predict_one(text) for _, text in chunk), return_exceptions=True
+        )
+        for (i, text), categoria in zip(chunk, outcomes):
+            if isinstance(categoria, Exception):
+                resultados[i] = {"indice": i, "error": f"No se pudo clasificar: {categoria}"}
+                continue
+            to_save.append((text, categoria, datetime.now()))
+            saved_indices.append(i)
+            resultados[i] = {"indice": i, "texto": text[:150], "categoria": categoria}
+
+    # put_many encola las primeras filas y descarta el resto si la cola se llena
+    queued = await writer.put_many(to_save)
+    for i in saved_indices[queued:]:
+        resultados[i]["guardado"] = False
+
+    errores = sum(1 for r in resultados if "error" in r)
+    no_guardados = len(to_save) - queued
+    print(f" Lote clasificado → {len(texts) - errores} ok, {errores} errores, {no_guardados} sin guardar")
+    return {"resultados": resultados, "total": len(texts), "errores": errores,
+            "no_guardados": no_guardados}
@@ -0,0 +1,147 @@
+# db.py
+# Pool de conexiones PostgreSQL compartido por todo el servicio.
+import os
+import time
+import threading
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+from metrics import (
+    DB_POOL_MAX_SIZE,
+    DB_POOL_IN_USE,
+    DB_POOL_IDLE,
+    DB_POOL_WAIT_TIME,
+    DB_POOL_DISCARDED,
+)
+
+DB_CONFIG = {
+    "host": os.getenv("POSTGRES_HOST", "postgres"),
+    "port": os.getenv("POSTGRES_PORT", "5432"),
+    "database": os.getenv("POSTGRES_DB", "doc_classifier"),
+    "user": os.getenv("POSTGRES_USER", "admin"),
+    "password": os.getenv("POSTGRES_PASSWORD", "admin123")
+}
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+# Segundos que se espera por una conexión libre antes de fallar
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Comprobar con SELECT 1 cada conexión al sacarla del pool
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+class ConnectionPool:
+    """ThreadedConnectionPool que espera por una conexión libre en vez de fallar
+    al agotarse, y descarta las conexiones rotas al sacarlas."""
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 pre_ping=DB_POOL_PRE_PING, **config):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **(config or DB_CONFIG))
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        DB_POOL_MAX_SIZE.set(maxconn)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        DB_POOL_IN_USE.set(self._in_use)
+        DB_POOL_IDLE.set(len(self._pool._pool))
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pg_pool.PoolError("Tiempo de espera agotado esperando una conexión del pool")
+        DB_POOL_WAIT_TIME.observe(time.monotonic() - start)
+        try:
+            conn = self._pool.getconn()
+            # Tras un reinicio de Postgres todas las conexiones libres están
+            # muertas: se descartan hasta dar con una sana o abrir una nueva
+            discarded = 0
+            while not self._is_healthy(conn):
+                DB_POOL_DISCARDED.inc()
+                self._pool.putconn(conn, close=True)
+                discarded += 1
+                if discarded > self.maxconn:
+                    raise pg_pool.PoolError("No hay conexiones sanas con la base de datos")
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._update_gauges()
+        return conn
+
+    def putconn(self, conn):
+        try:
+            self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self._update_gauges()
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._pool._pool),
+            }
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+@contextmanager
+def get_conn():
+    """Presta una conexión del pool; se devuelve al salir del bloque.
+
+    Las transacciones sin commit se deshacen al devolver la conexión.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
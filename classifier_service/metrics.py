@@ -0,0 +1,63 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Pool de conexiones PostgreSQL (db.py)
+DB_POOL_MAX_SIZE = Gauge(
+    "db_pool_max_connections",
+    "Tamaño máximo del pool de conexiones PostgreSQL"
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Conexiones del pool prestadas en este momento"
+)
+DB_POOL_IDLE = Gauge(
+    "db_pool_connections_idle",
+    "Conexiones abiertas y libres en el pool"
+)
+DB_POOL_WAIT_TIME = Histogram(
+    "db_pool_wait_seconds",
+    "Tiempo esperando una conexión libre del pool"
+)
+DB_POOL_DISCARDED = Counter(
+    "db_pool_discarded_total",
+    "Conexiones descartadas por fallar la comprobación de salud"
+)
+
+# Escritura diferida de clasificaciones (writer.py)
+WRITE_QUEUE_SIZE = Gauge(
+    "classifier_write_queue_rows",
+    "Clasificaciones pendientes de escribir en PostgreSQL"
+)
+WRITE_ROWS_WRITTEN = Counter(
+    "classifier_write_rows_total",
+    "Clasificaciones escritas en PostgreSQL por la escritura diferida"
+)
+WRITE_FLUSH_ERRORS = Counter(
+    "classifier_write_flush_errors_total",
+    "Lotes que fallaron al escribirse y se reintentarán"
+)
+WRITE_ROWS_DROPPED = Counter(
+    "classifier_write_rows_dropped_total",
+    "Clasificaciones descartadas porque la cola de escritura siguió llena más de WRITE_PUT_TIMEOUT"
+)
+WRITE_FLUSH_TIME = Histogram(
+    "classifier_write_flush_seconds",
+    "Tiempo de escritura de cada lote en PostgreSQL"
+)
+
+# Caché de predicciones (prediction_cache.py)
+PREDICTION_CACHE_HITS = Counter(
+    "classifier_prediction_cache_hits_total",
+    "Clasificaciones servidas desde la caché sin llamar a SMAV"
+)
+PREDICTION_CACHE_MISSES = Counter(
+    "classifier_prediction_cache_misses_total",
+    "Clasificaciones que no estaban en la caché"
+)
+PREDICTION_CACHE_SIZE = Gauge(
+    "classifier_prediction_cache_items",
+    "Predicciones guardadas en la caché"
+)
+PREDICTION_CACHE_INVALIDATIONS = Counter(
+    "classifier_prediction_cache_invalidations_total",
+    "Vaciados de la caché por cambio de versión del modelo o a petición"
+)
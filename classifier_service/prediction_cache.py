@@ -0,0 +1,100 @@
+# prediction_cache.py
+# Caché de predicciones de SMAV por hash del texto normalizado: los textos
+# repetidos (correspondencia tipo, facturas resubidas, reconstrucciones desde
+# MinIO) no vuelven a pasar por SMAV. LRU acotado con caducidad (TTL) y
+# vaciado completo cuando cambia la versión del modelo de SMAV.
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from metrics import (
+    PREDICTION_CACHE_HITS,
+    PREDICTION_CACHE_MISSES,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_INVALIDATIONS,
+)
+
+PREDICTION_CACHE_SIZE_MAX = int(os.getenv("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", 3600))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    # Solo cambios que no alteran lo que ve el modelo: forma Unicode y espacios
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, max_items=PREDICTION_CACHE_SIZE_MAX, ttl=PREDICTION_CACHE_TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.model_version = None
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[1] <= time.monotonic():
+                del self._items[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                PREDICTION_CACHE_MISSES.inc()
+                PREDICTION_CACHE_SIZE.set(len(self._items))
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            PREDICTION_CACHE_HITS.inc()
+            return item[0]
+
+    def put(self, key, categoria, model_version=None):
+        with self._lock:
+            # Una respuesta de otra versión del modelo invalida lo anterior
+            if model_version is not None and model_version != self.model_version:
+                self._clear(model_version)
+            self._items[key] = (categoria, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+            PREDICTION_CACHE_SIZE.set(len(self._items))
+
+    def set_model_version(self, model_version):
+        with self._lock:
+            if model_version != self.model_version:
+                self._clear(model_version)
+
+    def invalidate(self):
+        with self._lock:
+            self._clear(self.model_version)
+
+    def _clear(self, model_version):
+        if self._items:
+            PREDICTION_CACHE_INVALIDATIONS.inc()
+        self._items.clear()
+        self.model_version = model_version
+        PREDICTION_CACHE_SIZE.set(0)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._items),
+                "max_items": self.max_items,
+                "ttl_seconds": self.ttl,
+                "model_version": self.model_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,52 @@
+# test_classifier.py
+from fastapi.testclient import TestClient
+
+import classifier
+
+
+class FakeWriter:
+    def __init__(self, space):
+        self.space = space
+        self.rows = []
+
+    async def put(self, row):
+        return await self.put_many([row]) == 1
+
+    async def put_many(self, rows):
+        queued = rows[:self.space]
+        self.space -= len(queued)
+        self.rows.extend(queued)
+        return len(queued)
+
+
+def client(monkeypatch, space):
+    async def predict_one(text):
+        return "cat-" + text
+
+    monkeypatch.setattr(classifier, "predict_one", predict_one)
+    monkeypatch.setattr(classifier, "writer", FakeWriter(space))
+    # Sin "with": no se ejecuta el arranque (BD, SMAV, writer real)
+    return TestClient(classifier.app)
+
+
+def test_classify_text_saved(monkeypatch):
+    resp = client(monkeypatch, space=1).post("/classify-text", json={"text": "a"})
+    assert resp.status_code == 200
+    assert resp.json() == {"texto": "a", "categoria": "cat-a"}
+
+
+def test_classify_text_not_saved_returns_503(monkeypatch):
+    resp = client(monkeypatch, space=0).post("/classify-text", json={"text": "a"})
+    assert resp.status_code == 503
+    assert resp.json()["categoria"] == "cat-a"
+    assert "error" in resp.json()
+
+
+def test_classify_batch_flags_rows_not_saved(monkeypatch):
+    resp = client(monkeypatch, space=1).post("/classify-batch", json={"texts": ["a", "", "b"]})
+    body = resp.json()
+    assert resp.status_code == 200
+    assert body["errores"] == 1
+    assert body["no_guardados"] == 1
+    assert "guardado" not in body["resultados"][0]
+    assert body["resultados"][2] == {"indice": 2, "texto": "b", "categoria": "cat-b", "guardado": False}
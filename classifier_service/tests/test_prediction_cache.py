@@ -0,0 +1,62 @@
+# test_prediction_cache.py
+import prediction_cache
+from prediction_cache import PredictionCache, text_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_text_key_ignores_whitespace_and_unicode_form():
+    assert text_key("  Factura\n\tnº 1 ") == text_key("Factura nº 1")
+    assert text_key("Cafe\u0301") == text_key("Caf\u00e9")
+    assert text_key("factura") != text_key("Factura")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(max_items=2, ttl=60)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache.time, "monotonic", clock)
+    cache = PredictionCache(max_items=10, ttl=60)
+    cache.put("a", "A")
+    clock.now += 59
+    assert cache.get("a") == "A"
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["items"] == 0
+
+
+def test_new_model_version_clears_cache():
+    cache = PredictionCache(max_items=10, ttl=60)
+    cache.put("a", "A", model_version="v1")
+    cache.put("b", "B", model_version="v1")
+    cache.put("c", "C", model_version="v2")
+    assert cache.get("a") is None
+    assert cache.get("c") == "C"
+
+    cache.set_model_version("v3")
+    assert cache.get("c") is None
+    assert cache.model_version == "v3"
+
+
+def test_stats_hit_rate():
+    cache = PredictionCache(max_items=10, ttl=60)
+    cache.put("a", "A")
+    cache.get("a")
+    cache.get("b")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
@@ -0,0 +1,81 @@
+# test_writer.py
+import asyncio
+
+import writer as writer_module
+from writer import WriteBehindWriter
+
+
+class FakeDB:
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.batches = []
+
+    def __call__(self, rows):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("conexión perdida")
+        self.batches.append(list(rows))
+
+
+def test_rows_are_written_in_batches():
+    db = FakeDB()
+
+    async def scenario():
+        writer = WriteBehindWriter(batch_size=2, flush_interval=10, write=db)
+        writer.start()
+        assert await writer.put(1)
+        assert await writer.put_many([2, 3]) == 2
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert [row for batch in db.batches for row in batch] == [1, 2, 3]
+    assert all(len(batch) <= 2 for batch in db.batches)
+
+
+def test_put_returns_false_when_queue_stays_full():
+    async def scenario():
+        # Sin tarea de escritura: la cola nunca se vacía
+        writer = WriteBehindWriter(max_pending=1, write=FakeDB(), put_timeout=0.01)
+        assert await writer.put(1)
+        assert not await writer.put(2)
+        assert list(writer._buffer) == [1]
+
+    asyncio.run(scenario())
+
+
+def test_put_many_returns_rows_queued_before_dropping():
+    async def scenario():
+        writer = WriteBehindWriter(max_pending=2, write=FakeDB(), put_timeout=0.01)
+        assert await writer.put_many([1, 2, 3, 4]) == 2
+        assert list(writer._buffer) == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_put_waits_for_space_freed_by_flush():
+    db = FakeDB()
+
+    async def scenario():
+        writer = WriteBehindWriter(batch_size=1, flush_interval=0.01, max_pending=1,
+                                   write=db, put_timeout=1)
+        writer.start()
+        assert await writer.put(1)
+        assert await writer.put(2)
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert db.batches == [[1], [2]]
+
+
+def test_failed_batch_is_retried(monkeypatch):
+    monkeypatch.setattr(writer_module, "WRITE_RETRY_DELAY", 0)
+    db = FakeDB(fail=1)
+
+    async def scenario():
+        writer = WriteBehindWriter(batch_size=10, flush_interval=0.01, write=db)
+        writer.start()
+        await writer.put_many([1, 2])
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert db.batches == [[1, 2]]
@@ -0,0 +1,152 @@
+# writer.py
+# Escritura diferida (write-behind) de clasificaciones: las peticiones solo
+# encolan la fila y una tarea en segundo plano la inserta en PostgreSQL por lotes.
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from psycopg2.extras import execute_values
+
+from db import get_conn
+from metrics import (
+    WRITE_QUEUE_SIZE,
+    WRITE_ROWS_WRITTEN,
+    WRITE_FLUSH_ERRORS,
+    WRITE_FLUSH_TIME,
+    WRITE_ROWS_DROPPED,
+)
+
+logger = logging.getLogger("classifier")
+
+# Se vacía el buffer al llegar a WRITE_BATCH_SIZE filas o cada WRITE_FLUSH_INTERVAL segundos
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", 200))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", 1.0))
+# Filas pendientes como máximo; por encima, put() espera (backpressure)
+WRITE_QUEUE_MAX = int(os.getenv("WRITE_QUEUE_MAX", 10000))
+# Segundos que una petición espera por hueco en la cola; pasado ese tiempo
+# (p. ej. PostgreSQL caído) la fila se descarta, se cuenta en la métrica y
+# la petición informa de que no se guardó
+WRITE_PUT_TIMEOUT = float(os.getenv("WRITE_PUT_TIMEOUT", 5.0))
+WRITE_RETRY_DELAY = float(os.getenv("WRITE_RETRY_DELAY", 2.0))
+# Reintentos de la última escritura al apagar el servicio
+WRITE_SHUTDOWN_RETRIES = int(os.getenv("WRITE_SHUTDOWN_RETRIES", 5))
+
+
+def insert_rows(rows):
+    """Inserta filas (texto, categoria, fecha) en un único INSERT multi-fila."""
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        execute_values(
+            cursor,
+            "INSERT INTO clasificaciones (texto, categoria, fecha) VALUES %s",
+            rows,
+            page_size=len(rows),
+        )
+        conn.commit()
+        cursor.close()
+
+
+class WriteBehindWriter:
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 max_pending=WRITE_QUEUE_MAX, write=insert_rows, put_timeout=WRITE_PUT_TIMEOUT):
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.flush_interval = flush_interval
+        self._write = write
+        self._buffer = deque()
+        # Cada fila ocupa un hueco hasta que está escrita en la BD
+        self._space = asyncio.Semaphore(max_pending)
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _acquire(self, timeout):
+        if not self._space.locked():
+            await self._space.acquire()
+            return True
+        if timeout <= 0:
+            return False
+        try:
+            await asyncio.wait_for(self._space.acquire(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _append(self, row):
+        self._buffer.append(row)
+        WRITE_QUEUE_SIZE.inc()
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _drop(self, count):
+        WRITE_ROWS_DROPPED.inc(count)
+        logger.warning("Cola de escritura llena: se descartan %d registros", count)
+
+    async def put(self, row):
+        """Encola la fila; devuelve False si se descartó por falta de hueco."""
+        if not await self._acquire(self.put_timeout):
+            self._drop(1)
+            return False
+        self._append(row)
+        return True
+
+    async def put_many(self, rows):
+        """Encola las filas en orden; devuelve cuántas se encolaron (las
+        primeras) antes de descartar el resto por falta de hueco."""
+        # Un solo plazo para todo el lote: si se agota se descarta el resto
+        deadline = time.monotonic() + self.put_timeout
+        for i, row in enumerate(rows):
+            if not await self._acquire(deadline - time.monotonic()):
+                self._drop(len(rows) - i)
+                return i
+            self._append(row)
+        return len(rows)
+
+    async def stop(self):
+        """Deja de esperar y escribe todo lo pendiente antes de terminar."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        failures = 0
+        while True:
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                start = time.monotonic()
+                try:
+                    await loop.run_in_executor(None, self._write, batch)
+                except Exception as e:
+                    # El lote vuelve al principio del buffer y se reintenta más tarde
+                    self._buffer.extendleft(reversed(batch))
+                    failures += 1
+                    WRITE_FLUSH_ERRORS.inc()
+                    logger.error("Error escribiendo lote de %d registros en PostgreSQL: %s", len(batch), e)
+                    if self._closing and failures > WRITE_SHUTDOWN_RETRIES:
+                        logger.error("Se descartan %d registros no guardados al apagar", len(self._buffer))
+                        return
+                    await asyncio.sleep(WRITE_RETRY_DELAY)
+                    break
+                failures = 0
+                WRITE_FLUSH_TIME.observe(time.monotonic() - start)
+                WRITE_ROWS_WRITTEN.inc(len(batch))
+                WRITE_QUEUE_SIZE.dec(len(batch))
+                for _ in batch:
+                    self._space.release()
+
+            if self._closing and not self._buffer:
+                return
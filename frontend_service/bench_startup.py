@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# bench_startup.py
+# Mide el arranque del frontend en procesos nuevos (como un worker de uvicorn):
+# tiempo de "import main" y tiempo hasta que el lifespan deja pasar peticiones.
+#
+#   python bench_startup.py --runs 10
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = r"""
+import os, sys, time, json, asyncio
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def start():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+loop = asyncio.new_event_loop()
+t2 = loop.run_until_complete(start())
+print(json.dumps({
+    "import_s": t1 - t0,
+    "lifespan_s": t2 - t1,
+    "heavy_modules": [m for m in ("matplotlib", "sklearn") if m in sys.modules],
+}))
+sys.stdout.flush()
+# No se espera a que terminen los reintentos contra la BD en segundo plano
+os._exit(0)
+"""
+
+
+def run_probe():
+    env = dict(os.environ)
+    # Servicios inalcanzables a propósito: el arranque no debe depender de ellos
+    env.setdefault("POSTGRES_HOST", "127.0.0.1")
+    env.setdefault("POSTGRES_PORT", "1")
+    env.setdefault("MINIO_HOST", "127.0.0.1:1")
+    env.setdefault("STARTUP_DB_RETRIES", "1")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=HERE, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque del frontend")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run_probe() for _ in range(args.runs)]
+    for key in ("import_s", "lifespan_s"):
+        values = [r[key] for r in results]
+        print(f"{key:12s} mediana={statistics.median(values):.3f}s  "
+              f"min={min(values):.3f}s  max={max(values):.3f}s")
+    heavy = sorted({m for r in results for m in r["heavy_modules"]})
+    print("Módulos pesados cargados al arrancar:", ", ".join(heavy) or "ninguno")
+
+
+if __name__ == "__main__":
+    main()
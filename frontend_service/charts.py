@@ -0,0 +1,85 @@
+# charts.py
+# Renderizado de la matriz de confusión, cacheado por su contenido: mientras
+# los conteos no cambian, las recargas del panel no vuelven a dibujarla.
+import io
+import os
+import json
+import base64
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+CONFUSION_MATRIX_FORMATS = ("png", "svg", "json")
+CONFUSION_MATRIX_CACHE_SIZE = int(os.getenv("CONFUSION_MATRIX_CACHE_SIZE", 32))
+
+# Extremos de la escala 'Blues' de matplotlib
+_LIGHT = (0xf7, 0xfb, 0xff)
+_DARK = (0x08, 0x30, 0x6b)
+
+
+def _png(labels, cm):
+    # matplotlib tarda segundos en importarse: solo se carga si hace falta un PNG
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(6, 6))
+    im = ax.imshow(cm, cmap='Blues')
+    ax.set_xticks(range(len(labels)))
+    ax.set_yticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=45, ha='right')
+    ax.set_yticklabels(labels)
+    plt.colorbar(im)
+    buf = io.BytesIO()
+    plt.tight_layout()
+    plt.savefig(buf, format='png')
+    plt.close(fig)
+    return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+
+def _svg(labels, cm):
+    # SVG generado a mano: mucho más ligero que pasar por matplotlib
+    cell = 48
+    label_width = 8 * max(len(label) for label in labels) + 12
+    left, top = label_width, label_width
+    size = cell * len(labels)
+    peak = max((v for row in cm for v in row), default=0) or 1
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{left + size + 10}" '
+        f'height="{top + size + 10}" font-family="sans-serif" font-size="12">'
+    ]
+    for i, label in enumerate(labels):
+        y = top + i * cell + cell / 2
+        x = left + i * cell + cell / 2
+        parts.append(f'<text x="{left - 6}" y="{y}" text-anchor="end" '
+                     f'dominant-baseline="middle" fill="#d1d5db">{escape(label)}</text>')
+        parts.append(f'<text transform="translate({x},{top - 6}) rotate(-45)" '
+                     f'fill="#d1d5db">{escape(label)}</text>')
+    for i, row in enumerate(cm):
+        for j, value in enumerate(row):
+            t = value / peak
+            color = "#%02x%02x%02x" % tuple(
+                round(a + (b - a) * t) for a, b in zip(_LIGHT, _DARK)
+            )
+            x, y = left + j * cell, top + i * cell
+            text_color = "#ffffff" if t > 0.5 else "#111827"
+            parts.append(f'<rect x="{x}" y="{y}" width="{cell}" height="{cell}" fill="{color}"/>')
+            parts.append(f'<text x="{x + cell / 2}" y="{y + cell / 2}" text-anchor="middle" '
+                         f'dominant-baseline="middle" fill="{text_color}">{value}</text>')
+    parts.append('</svg>')
+    return "".join(parts)
+
+
+@lru_cache(maxsize=CONFUSION_MATRIX_CACHE_SIZE)
+def render_confusion_matrix(labels, cm, fmt="png"):
+    """Devuelve la matriz de confusión renderizada.
+
+    labels y cm deben ser tuplas (inmutables) porque forman la clave de la
+    caché. 'png' devuelve la imagen en base64, 'svg' el marcado SVG y 'json'
+    los datos para dibujarla en el navegador.
+    """
+    if fmt == "svg":
+        return _svg(labels, cm)
+    if fmt == "json":
+        return json.dumps({"labels": list(labels), "matrix": [list(row) for row in cm]})
+    return _png(labels, cm)
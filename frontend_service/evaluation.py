@@ -0,0 +1,44 @@
+# evaluation.py
+# Métricas de clasificación (precision/recall/F1/accuracy) calculadas a partir
+# de los conteos agregados de la matriz de confusión, sin recorrer los registros.
+
+
+def metrics_from_counts(counts):
+    """Calcula las métricas desde tuplas (ground_truth, smav_pred, cantidad).
+
+    Equivale a precision_recall_fscore_support(..., zero_division=0),
+    accuracy_score y confusion_matrix de sklearn sobre las etiquetas presentes,
+    pero en O(etiquetas²).
+    """
+    counts = [(gt, pred, int(n)) for gt, pred, n in counts if n]
+    labels = sorted({gt for gt, _, _ in counts} | {pred for _, pred, _ in counts})
+    index = {label: i for i, label in enumerate(labels)}
+    size = len(labels)
+
+    cm = [[0] * size for _ in range(size)]
+    for gt, pred, n in counts:
+        cm[index[gt]][index[pred]] += n
+
+    support = [sum(row) for row in cm]
+    predicted = [sum(cm[i][j] for i in range(size)) for j in range(size)]
+    true_positives = [cm[i][i] for i in range(size)]
+
+    precision, recall, fscore = [], [], []
+    for tp, n_pred, n_true in zip(true_positives, predicted, support):
+        p = tp / n_pred if n_pred else 0.0
+        r = tp / n_true if n_true else 0.0
+        precision.append(p)
+        recall.append(r)
+        fscore.append(2 * p * r / (p + r) if p + r else 0.0)
+
+    total = sum(support)
+    return {
+        "labels": labels,
+        "precision": precision,
+        "recall": recall,
+        "fscore": fscore,
+        "support": support,
+        "accuracy": sum(true_positives) / total if total else 0.0,
+        "f1_macro": sum(fscore) / size if size else 0.0,
+        "confusion_matrix": cm,
+    }
@@ -0,0 +1,338 @@
+# jobs.py
+# Cola de trabajos para las subidas de documentos. /upload guarda el archivo en
+# MinIO y encola el trabajo en PostgreSQL (tabla upload_jobs); un número fijo
+# de workers en segundo plano lo pasa por SMAV, el clasificador y la BD.
+import os
+import time
+import uuid
+import asyncio
+import logging
+import requests
+from psycopg2.extras import Json
+
+from db import get_conn
+from metrics import (
+    FRONTEND_ERRORS,
+    UPLOAD_JOBS_ENQUEUED,
+    UPLOAD_JOBS_FINISHED,
+    UPLOAD_JOB_DURATION,
+)
+
+logger = logging.getLogger("frontend")
+
+SMAV_PROCESS_URL = os.getenv("SMAV_PROCESS_URL", "http://smav_service:8000/process-document")
+CLASSIFIER_URL = os.getenv("CLASSIFIER_URL", "http://classifier_service:8080/classify-text")
+# Bucket propio para las subidas en cola: rebuild_from_minio recorre
+# incoming-docs y volvería a procesar (e insertar) cada documento subido
+UPLOAD_BUCKET = os.getenv("MINIO_BUCKET_UPLOADS", "upload-staging")
+
+# Trabajos procesados a la vez por cada proceso del frontend
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 2))
+# Segundos entre consultas a la cola cuando no hay trabajo
+UPLOAD_POLL_INTERVAL = float(os.getenv("UPLOAD_POLL_INTERVAL", 2))
+# Un trabajo 'procesando' sin cambios durante este tiempo se da por abandonado
+# (p. ej. el worker se reinició) y vuelve a la cola
+UPLOAD_JOB_TIMEOUT = int(os.getenv("UPLOAD_JOB_TIMEOUT", 600))
+UPLOAD_MAX_ATTEMPTS = int(os.getenv("UPLOAD_MAX_ATTEMPTS", 3))
+# Espera antes de reintentar un trabajo fallido: se duplica con cada intento
+# hasta UPLOAD_RETRY_BACKOFF_MAX, para que una caída de SMAV o de la BD no
+# agote los intentos en unos milisegundos
+UPLOAD_RETRY_BACKOFF = float(os.getenv("UPLOAD_RETRY_BACKOFF", 10))
+UPLOAD_RETRY_BACKOFF_MAX = float(os.getenv("UPLOAD_RETRY_BACKOFF_MAX", 300))
+# Las subidas van a MinIO por partes de este tamaño (mínimo de S3: 5 MiB) y a
+# SMAV por bloques de UPLOAD_CHUNK_SIZE: la memoria por subida no depende del
+# tamaño del archivo
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", 5 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 256 * 1024))
+
+
+def enqueue_upload(minio_client, username, filename, content_type, fileobj):
+    """Sube el archivo a MinIO (multipart, leyendo fileobj por partes) y encola el trabajo."""
+    job_id = str(uuid.uuid4())
+    object_name = f"uploads/{job_id}/{filename}"
+    minio_client.put_object(
+        UPLOAD_BUCKET, object_name, fileobj, length=-1, part_size=UPLOAD_PART_SIZE,
+        content_type=content_type or "application/octet-stream"
+    )
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO upload_jobs (id, username, filename, content_type, object_name)
+            VALUES (%s, %s, %s, %s, %s);
+        """, (job_id, username, filename, content_type, object_name))
+        conn.commit()
+        cur.close()
+    UPLOAD_JOBS_ENQUEUED.inc()
+    return job_id
+
+
+def get_job(job_id):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, username, filename, estado, resultado, error, creado_en, actualizado_en
+            FROM upload_jobs WHERE id = %s;
+        """, (job_id,))
+        row = cur.fetchone()
+        cur.close()
+    if not row:
+        return None
+    return {
+        "job_id": str(row[0]),
+        "username": row[1],
+        "filename": row[2],
+        "estado": row[3],
+        "resultado": row[4],
+        "error": row[5],
+        "creado_en": row[6].isoformat() if row[6] else None,
+        "actualizado_en": row[7].isoformat() if row[7] else None,
+    }
+
+
+def claim_job():
+    """Toma el trabajo pendiente más antiguo que ya se pueda reintentar; SKIP
+    LOCKED evita que dos workers (de este u otro proceso) tomen el mismo."""
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE upload_jobs
+            SET estado = 'procesando', intentos = intentos + 1, actualizado_en = NOW()
+            WHERE id = (
+                SELECT id FROM upload_jobs
+                WHERE estado = 'pendiente' AND disponible_en <= NOW()
+                ORDER BY creado_en
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, username, filename, content_type, object_name, intentos;
+        """)
+        row = cur.fetchone()
+        conn.commit()
+        cur.close()
+    if not row:
+        return None
+    return {
+        "job_id": str(row[0]),
+        "username": row[1],
+        "filename": row[2],
+        "content_type": row[3],
+        "object_name": row[4],
+        "intentos": row[5],
+    }
+
+
+def requeue_stale_jobs():
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE upload_jobs
+            SET estado = CASE WHEN intentos >= %s THEN 'error' ELSE 'pendiente' END,
+                error = CASE WHEN intentos >= %s THEN 'Tiempo de procesamiento agotado' ELSE error END,
+                actualizado_en = NOW()
+            WHERE estado = 'procesando'
+              AND actualizado_en < NOW() - make_interval(secs => %s);
+        """, (UPLOAD_MAX_ATTEMPTS, UPLOAD_MAX_ATTEMPTS, UPLOAD_JOB_TIMEOUT))
+        conn.commit()
+        cur.close()
+
+
+def finish_job(job_id, estado, resultado=None, error=None):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE upload_jobs
+            SET estado = %s, resultado = %s, error = %s, actualizado_en = NOW()
+            WHERE id = %s;
+        """, (estado, Json(resultado) if resultado is not None else None, error, job_id))
+        conn.commit()
+        cur.close()
+    UPLOAD_JOBS_FINISHED.labels(estado=estado).inc()
+
+
+def retry_delay(intentos):
+    return min(UPLOAD_RETRY_BACKOFF * 2 ** (intentos - 1), UPLOAD_RETRY_BACKOFF_MAX)
+
+
+def retry_job(job_id, error, intentos):
+    # Vuelve a la cola tras la espera; claim_job ya contó el intento
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE upload_jobs
+            SET estado = 'pendiente', error = %s, actualizado_en = NOW(),
+                disponible_en = NOW() + make_interval(secs => %s)
+            WHERE id = %s;
+        """, (error, retry_delay(intentos), job_id))
+        conn.commit()
+        cur.close()
+
+
+def delete_upload(minio_client, job):
+    minio_client.remove_object(UPLOAD_BUCKET, job["object_name"])
+
+
+def multipart_stream(field, filename, content_type, chunks, boundary):
+    """Cuerpo multipart/form-data generado al vuelo a partir de los bloques del archivo."""
+    filename = filename.replace('"', '%22')
+    yield (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: {content_type or "application/octet-stream"}\r\n\r\n'
+    ).encode("utf-8")
+    yield from chunks
+    yield f'\r\n--{boundary}--\r\n'.encode("utf-8")
+
+
+def process_upload(minio_client, job):
+    """Pasa el documento por SMAV y el clasificador y guarda la clasificación."""
+    # El objeto se reenvía a SMAV por bloques según se lee de MinIO
+    data = minio_client.get_object(UPLOAD_BUCKET, job["object_name"])
+    boundary = uuid.uuid4().hex
+    try:
+        response = requests.post(
+            SMAV_PROCESS_URL,
+            data=multipart_stream(
+                "file", job["filename"], job["content_type"],
+                data.stream(UPLOAD_CHUNK_SIZE), boundary
+            ),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            timeout=180
+        )
+    finally:
+        data.close()
+        data.release_conn()
+    if not response.ok:
+        raise RuntimeError(f"Error en SMAV: {response.status_code} - {response.text}")
+
+    smav_result = response.json()
+    texto_ocr = smav_result.get("extracted_text", "")
+    smav_categoria = smav_result.get("final_category", "Desconocido")
+    confianza_smav = smav_result.get("smav_confidence", None)
+    archivo_txt = smav_result.get("classified_file_minio", "")
+
+    resumen_proceso = (
+        f"Procesado por SMAV.\n"
+        f"Categoría: {smav_categoria}\n"
+        f"Confianza SMAV: {confianza_smav}\n"
+        f"Archivo TXT: {archivo_txt}\n"
+        f"Mensaje: {smav_result.get('status','')}"
+    )
+
+    # --- Obtener predicción del clasificador ---
+    classifier_pred = None
+    try:
+        if texto_ocr:
+            resp = requests.post(CLASSIFIER_URL, json={"text": texto_ocr}, timeout=10)
+            if resp.ok:
+                j = resp.json()
+                classifier_pred = j.get("categoria") or j.get("category") or j.get("label") or None
+    except Exception as e:
+        logger.exception("Error calling classifier service: %s", e)
+        classifier_pred = None
+
+    # --- Guardar en la base de datos ---
+    # Asegura que el usuario nunca sea None
+    username_db = job["username"] or "anon"
+    # Ground truth igual a classifier_pred
+    ground_truth = classifier_pred
+    # Si falla, la excepción llega al worker: el trabajo vuelve a la cola (o
+    # queda en 'error') en vez de darse por completado sin haber guardado nada.
+    # Si lo que falla es algo posterior (p. ej. finish_job), el reintento no
+    # duplica la fila: hay como mucho una por job_id
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO clasificaciones
+            (job_id, texto, categoria, username, smav_pred, classifier_pred, ground_truth, confidence)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (job_id) DO NOTHING
+            """,
+            (
+                job["job_id"],
+                resumen_proceso,
+                smav_categoria,
+                username_db,
+                smav_categoria,
+                classifier_pred,
+                ground_truth,
+                confianza_smav
+            )
+        )
+        conn.commit()
+        cur.close()
+    logger.info(f"Documento guardado: user={username_db}, categoria={smav_categoria}")
+
+    return {
+        "resumen": resumen_proceso,
+        "categoria": smav_categoria,
+        "texto_ocr": texto_ocr,
+    }
+
+
+class UploadWorkers:
+    """Workers asíncronos que consumen la cola; el trabajo bloqueante (HTTP,
+    MinIO, BD) corre en hilos, así que nunca hay más de `size` a la vez."""
+
+    def __init__(self, minio_client, size=UPLOAD_WORKERS):
+        self.minio_client = minio_client
+        self.size = size
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.size)]
+
+    def notify(self):
+        # Hay un trabajo nuevo: no hace falta esperar a la siguiente consulta
+        self._wakeup.set()
+
+    async def stop(self):
+        # Los trabajos en curso terminan; los pendientes quedan en la cola
+        self._stopping = True
+        self._wakeup.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                job = await asyncio.to_thread(claim_job)
+            except Exception as e:
+                logger.warning("No se pudo consultar la cola de subidas: %s", e)
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.to_thread(requeue_stale_jobs)
+                except Exception:
+                    pass
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), UPLOAD_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            start = time.monotonic()
+            try:
+                resultado = await asyncio.to_thread(process_upload, self.minio_client, job)
+                await asyncio.to_thread(finish_job, job["job_id"], "completado", resultado)
+                # La copia en cola ya no hace falta; la de los fallidos se
+                # conserva para poder revisarla
+                try:
+                    await asyncio.to_thread(delete_upload, self.minio_client, job)
+                except Exception as e:
+                    logger.warning("No se pudo borrar la subida %s: %s", job["object_name"], e)
+            except Exception as e:
+                FRONTEND_ERRORS.inc()
+                logger.exception("Upload job %s error: %s", job["job_id"], e)
+                try:
+                    if job["intentos"] < UPLOAD_MAX_ATTEMPTS:
+                        await asyncio.to_thread(retry_job, job["job_id"], str(e), job["intentos"])
+                    else:
+                        await asyncio.to_thread(finish_job, job["job_id"], "error", None, str(e))
+                except Exception:
+                    logger.exception("No se pudo marcar el trabajo %s como fallido", job["job_id"])
+            UPLOAD_JOB_DURATION.observe(time.monotonic() - start)
@@ -3,19 +3,22 @@ from fastapi import FastAPI, UploadFile, File, Form, Request, Depends, HTTPExcep
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 from jose import jwt, JWTError
 from passlib.context import CryptContext
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from minio import Minio
 from prometheus_client import make_asgi_app
-import requests, psycopg2, io, os, traceback, time, logging, re
-from sklearn.metrics import precision_recall_fscore_support, accuracy_score, confusion_matrix
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import requests, io, os, traceback, time, logging, re, asyncio
 import base64
 import json
 
+from db import get_conn, close_pool
+from migrations import apply_migrations
+from evaluation import metrics_from_counts
+from charts import render_confusion_matrix, CONFUSION_MATRIX_FORMATS
+from jobs import UploadWorkers, enqueue_upload, get_job, UPLOAD_BUCKET
+
 # métricas definidas en frontend_service/metrics.py
 from metrics import (
     FRONTEND_VISITS,
@@ -27,33 +30,49 @@ from metrics import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("frontend")
 
-app = FastAPI(title="SMAV OCR & Classifier")
+# Reintentos de init_db al arrancar (el contenedor de Postgres puede tardar)
+STARTUP_DB_RETRIES = int(os.getenv("STARTUP_DB_RETRIES", 8))
+STARTUP_DB_RETRY_DELAY = float(os.getenv("STARTUP_DB_RETRY_DELAY", 2))
+
+@asynccontextmanager
+async def lifespan(app):
+    # El arranque no espera a MinIO ni a Postgres: la preparación corre en
+    # segundo plano y /ready indica cuándo ha terminado
+    app.state.ready = False
+    app.state.startup_task = asyncio.create_task(asyncio.to_thread(run_startup_tasks, app))
+    app.state.upload_workers = UploadWorkers(MINIO_CLIENT)
+    app.state.upload_workers.start()
+    yield
+    await app.state.upload_workers.stop()
+    await asyncio.to_thread(close_pool)
+
+app = FastAPI(title="SMAV OCR & Classifier", lifespan=lifespan)
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
 templates = Jinja2Templates(directory="templates")
 
 SECRET_KEY = os.getenv("SECRET_KEY", "super_secret_key_123")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60 * 24))
+
+# Historial paginado por cursor (fecha, id)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 50))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", 200))
+HISTORY_PREVIEW_CHARS = int(os.getenv("HISTORY_PREVIEW_CHARS", 60))
+
+# Formato por defecto de la matriz de confusión: png, svg o json (dibujada en el navegador)
+CONFUSION_MATRIX_FORMAT = os.getenv("CONFUSION_MATRIX_FORMAT", "png")
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 OCR_URL = os.getenv("OCR_URL", "http://ocr_service:8000/extract-text")
 CLASSIFIER_URL = os.getenv("CLASSIFIER_URL", "http://classifier_service:8080/classify-text")
 # Default for container-to-container requests inside Docker network:
 SMAV_METRICS_URL = os.getenv("SMAV_METRICS_URL", "http://smav_service:8000/metrics")
-SMAV_PROCESS_URL = os.getenv("SMAV_PROCESS_URL", "http://smav_service:8000/process-document")
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "http://n8n:5678/webhook/procesar-documento")
 
-DB_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "postgres"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-    "database": os.getenv("POSTGRES_DB", "doc_classifier"),
-    "user": os.getenv("POSTGRES_USER", "admin"),
-    "password": os.getenv("POSTGRES_PASSWORD", "admin123")
-}
-
 MINIO_CLIENT = Minio(
     os.getenv("MINIO_HOST", "minio:9000"),
     access_key=os.getenv("MINIO_ROOT_USER", "admin"),
@@ -61,20 +80,17 @@ MINIO_CLIENT = Minio(
     secure=False
 )
 
-for bucket in ["incoming-docs", "classified-docs"]:
-    try:
-        if not MINIO_CLIENT.bucket_exists(bucket):
-            MINIO_CLIENT.make_bucket(bucket)
-    except Exception as e:
-        logger.warning(f"Bucket '{bucket}' no creado: {e}")
-
+def ensure_buckets():
+    for bucket in ["incoming-docs", "classified-docs", UPLOAD_BUCKET]:
+        try:
+            if not MINIO_CLIENT.bucket_exists(bucket):
+                MINIO_CLIENT.make_bucket(bucket)
+        except Exception as e:
+            logger.warning(f"Bucket '{bucket}' no creado: {e}")
 
-def get_db_conn():
-    return psycopg2.connect(**DB_CONFIG)
 
 def init_db():
-    try:
-        conn = get_db_conn()
+    with get_conn() as conn:
         cur = conn.cursor()
         cur.execute("""
             CREATE TABLE IF NOT EXISTS usuarios (
@@ -100,18 +116,27 @@ def init_db():
         """)
         conn.commit()
         cur.close()
-        conn.close()
-        logger.info("Base de datos inicializada correctamente.")
-    except Exception as e:
-        logger.exception("Error inicializando la BD: %s", e)
+        apply_migrations(conn)
+    logger.info("Base de datos inicializada correctamente.")
 
-# Retry init_db a few times (Postgres container might not be ready)
-for _ in range(8):
-    try:
-        init_db()
-        break
-    except Exception:
-        time.sleep(2)
+def run_startup_tasks(app):
+    ensure_buckets()
+    # Retry init_db a few times (Postgres container might not be ready)
+    for attempt in range(1, STARTUP_DB_RETRIES + 1):
+        try:
+            init_db()
+            app.state.ready = True
+            return
+        except Exception as e:
+            logger.warning("Error inicializando la BD (intento %s/%s): %s", attempt, STARTUP_DB_RETRIES, e)
+            time.sleep(STARTUP_DB_RETRY_DELAY)
+    logger.error("No se pudo inicializar la BD tras %s intentos", STARTUP_DB_RETRIES)
+
+@app.get("/ready")
+def ready(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse({"ready": False}, status_code=503)
+    return {"ready": True}
 
 def create_token(username, rol):
     exp = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -125,27 +150,25 @@ def decode_token(token):
         raise HTTPException(status_code=401, detail="Token inválido o expirado")
 
 def get_user(username):
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT username, password_hash, rol FROM usuarios WHERE username=%s", (username,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT username, password_hash, rol FROM usuarios WHERE username=%s", (username,))
+        row = cur.fetchone()
+        cur.close()
     if row:
         return {"username": row[0], "password_hash": row[1], "rol": row[2]}
     return None
 
 def create_user(username, password, rol="usuario"):
-    conn = get_db_conn()
-    cur = conn.cursor()
     hashed = pwd_context.hash(password)
-    cur.execute(
-        "INSERT INTO usuarios (username, password_hash, rol) VALUES (%s, %s, %s) ON CONFLICT (username) DO NOTHING;",
-        (username, hashed, rol)
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO usuarios (username, password_hash, rol) VALUES (%s, %s, %s) ON CONFLICT (username) DO NOTHING;",
+            (username, hashed, rol)
+        )
+        conn.commit()
+        cur.close()
 
 def get_current_user_by_request(request: Request):
     token = request.cookies.get("access_token")
@@ -256,132 +279,99 @@ async def upload_file(request: Request, file: UploadFile = File(...), user: dict
     start = time.time()
     FRONTEND_UPLOADS.inc()
     try:
-        # Leer archivo y enviar a SMAV
-        file_bytes = await file.read()
-        files = {'file': (file.filename, file_bytes, file.content_type)}
-        response = requests.post(SMAV_PROCESS_URL, files=files, timeout=180)
-        if not response.ok:
-            FRONTEND_ERRORS.inc()
-            return HTMLResponse(f"<p>Error en SMAV: {response.status_code} - {response.text}</p>", status_code=500)
-
-        smav_result = response.json()
-        texto_ocr = smav_result.get("extracted_text", "")
-        smav_categoria = smav_result.get("final_category", "Desconocido")
-        confianza_smav = smav_result.get("smav_confidence", None)
-        archivo_txt = smav_result.get("classified_file_minio", "")
-
-        resumen_proceso = (
-            f"Procesado por SMAV.\n"
-            f"Categoría: {smav_categoria}\n"
-            f"Confianza SMAV: {confianza_smav}\n"
-            f"Archivo TXT: {archivo_txt}\n"
-            f"Mensaje: {smav_result.get('status','')}"
+        # El archivo se sube a MinIO por partes desde el fichero temporal del
+        # formulario y el procesamiento (SMAV, clasificador, BD) queda
+        # encolado para los workers: la petición no espera por él
+        job_id = await asyncio.to_thread(
+            enqueue_upload, MINIO_CLIENT, user.get("username"),
+            file.filename, file.content_type, file.file
         )
-
-        # --- Obtener predicción del clasificador ---
-        classifier_pred = None
-        try:
-            if texto_ocr:
-                resp = requests.post(CLASSIFIER_URL, json={"text": texto_ocr}, timeout=10)
-                if resp.ok:
-                    j = resp.json()
-                    classifier_pred = j.get("categoria") or j.get("category") or j.get("label") or None
-        except Exception as e:
-            logger.exception("Error calling classifier service: %s", e)
-            classifier_pred = None
-
-        # --- Guardar en la base de datos ---
-        try:
-            conn = get_db_conn()
-            cur = conn.cursor()
-
-            # Asegura que el usuario nunca sea None
-            username_db = user.get("username") or "anon"
-            # Ground truth igual a classifier_pred
-            ground_truth = classifier_pred
-
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS clasificaciones (
-                    id SERIAL PRIMARY KEY,
-                    texto TEXT,
-                    categoria VARCHAR(255),
-                    fecha TIMESTAMP DEFAULT NOW(),
-                    username VARCHAR(100) REFERENCES usuarios(username),
-                    smav_pred VARCHAR(255),
-                    classifier_pred VARCHAR(255),
-                    ground_truth VARCHAR(255),
-                    confidence NUMERIC
-                );
-                """
-            )
-
-            cur.execute(
-                """
-                INSERT INTO clasificaciones
-                (texto, categoria, username, smav_pred, classifier_pred, ground_truth, confidence)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    resumen_proceso,
-                    smav_categoria,
-                    username_db,
-                    smav_categoria,
-                    classifier_pred,
-                    ground_truth,
-                    confianza_smav
-                )
-            )
-
-            conn.commit()
-            cur.close()
-            conn.close()
-            logger.info(f"Documento guardado: user={username_db}, categoria={smav_categoria}")
-
-        except Exception as e:
-            FRONTEND_ERRORS.inc()
-            logger.exception("Error guardando en BD local: %s", e)
-
-        DASHBOARD_RENDER_TIME.observe(time.time() - start)
-        return templates.TemplateResponse("upload.html", {
-            "request": request,
-            "user": user,
-            "result": resumen_proceso,
-            "category": smav_categoria,
-            "texto_ocr": texto_ocr
-        })
-
+        request.app.state.upload_workers.notify()
     except Exception as e:
         FRONTEND_ERRORS.inc()
         logger.exception("Upload flow error: %s", e)
         return HTMLResponse(f"<p>Error procesando el archivo: {e}</p>", status_code=500)
 
+    DASHBOARD_RENDER_TIME.observe(time.time() - start)
+    if "application/json" in request.headers.get("accept", ""):
+        return JSONResponse({"job_id": job_id, "estado": "pendiente"}, status_code=202)
+    return templates.TemplateResponse("upload.html", {
+        "request": request,
+        "user": user,
+        "job_id": job_id,
+        "filename": file.filename
+    })
+
+@app.get("/upload/status/{job_id}")
+def upload_status(job_id: str, user: dict = Depends(get_current_user_by_request)):
+    try:
+        job = get_job(job_id)
+    except Exception as e:
+        # id con formato inválido o BD no disponible
+        logger.warning("upload_status error: %s", e)
+        job = None
+    if not job or (user["rol"] != "admin" and job["username"] != user["username"]):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+def encode_history_cursor(fecha, row_id):
+    raw = f"{fecha.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_history_cursor(cursor):
+    try:
+        fecha, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(fecha), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
 @app.get("/history", response_class=HTMLResponse)
-def history(request: Request, user: dict = Depends(get_current_user_by_request)):
+def history(request: Request, cursor: str = None, size: int = HISTORY_PAGE_SIZE,
+            user: dict = Depends(get_current_user_by_request)):
+    size = max(1, min(size, HISTORY_MAX_PAGE_SIZE))
+    after = decode_history_cursor(cursor) if cursor else None
     rows = []
+    next_cursor = None
     try:
-        conn = get_db_conn()
-        cur = conn.cursor()
-        if user["rol"] == "admin":
-            cur.execute("""
-                SELECT texto, categoria, fecha, username
-                FROM clasificaciones
-                ORDER BY fecha DESC
-            """)
-        else:
-            cur.execute("""
-                SELECT texto, categoria, fecha, username
+        # Paginación por cursor: cada página continúa desde la última
+        # (fecha, id) vista y lee solo size + 1 filas del índice
+        conditions, params = [], [HISTORY_PREVIEW_CHARS]
+        if user["rol"] != "admin":
+            conditions.append("username = %s")
+            params.append(user["username"])
+        if after:
+            conditions.append("(fecha, id) < (%s, %s)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(size + 1)
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT LEFT(COALESCE(texto, ''), %s), categoria, fecha, username, id
                 FROM clasificaciones
-                WHERE username = %s
-                ORDER BY fecha DESC
-            """, (user["username"],))
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+                {where}
+                ORDER BY fecha DESC, id DESC
+                LIMIT %s
+            """, params)
+            rows = cur.fetchall()
+            cur.close()
+        if len(rows) > size:
+            rows = rows[:size]
+            next_cursor = encode_history_cursor(rows[-1][2], rows[-1][4])
     except Exception as e:
         FRONTEND_ERRORS.inc()
         logger.exception("history error: %s", e)
-    return templates.TemplateResponse("history.html", {"request": request, "rows": rows, "user": user})
+    return templates.TemplateResponse("history.html", {
+        "request": request,
+        "rows": rows,
+        "user": user,
+        "size": size,
+        "is_first_page": after is None,
+        "next_cursor": next_cursor
+    })
+
+# Conteos leídos de las tablas resumen (mantenidas por triggers, ver migrations.py)
+USER_COUNTS_SQL = "SELECT NULLIF(username, ''), cantidad FROM resumen_usuarios WHERE cantidad > 0;"
 
 @app.get("/admin", response_class=HTMLResponse)
 def admin_panel(request: Request, user: dict = Depends(get_current_user_by_request)):
@@ -389,14 +379,13 @@ def admin_panel(request: Request, user: dict = Depends(get_current_user_by_reque
         raise HTTPException(status_code=403, detail="No autorizado")
     users, stats = [], []
     try:
-        conn = get_db_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT username, rol FROM usuarios ORDER BY username;")
-        users = cur.fetchall()
-        cur.execute("SELECT username, COUNT(*) FROM clasificaciones GROUP BY username;")
-        stats = cur.fetchall()
-        cur.close()
-        conn.close()
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT username, rol FROM usuarios ORDER BY username;")
+            users = cur.fetchall()
+            cur.execute(USER_COUNTS_SQL)
+            stats = cur.fetchall()
+            cur.close()
     except Exception as e:
         FRONTEND_ERRORS.inc()
         logger.exception("admin_panel error: %s", e)
@@ -408,12 +397,11 @@ def admin_stats(user: dict = Depends(get_current_user_by_request)):
         raise HTTPException(status_code=403, detail="No autorizado")
     stats = []
     try:
-        conn = get_db_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT username, COUNT(*) FROM clasificaciones GROUP BY username;")
-        stats = cur.fetchall()
-        cur.close()
-        conn.close()
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(USER_COUNTS_SQL)
+            stats = cur.fetchall()
+            cur.close()
     except Exception as e:
         FRONTEND_ERRORS.inc()
         logger.exception("admin_stats error: %s", e)
@@ -427,46 +415,32 @@ def admin_metrics(request: Request, user: dict = Depends(get_current_user_by_req
         raise HTTPException(status_code=403, detail="No autorizado")
 
     try:
-        conn = get_db_conn()
-        cur = conn.cursor()
-
-        # Total documentos clasificados
-        cur.execute("SELECT COUNT(*) FROM clasificaciones;")
-        total_docs = cur.fetchone()[0]
+        with get_conn() as conn:
+            cur = conn.cursor()
 
-        # Clasificados por categoría
-        cur.execute("""
-            SELECT categoria, COUNT(*)
-            FROM clasificaciones
-            GROUP BY categoria
-            ORDER BY COUNT(*) DESC;
-        """)
-        por_categoria = [{"categoria": r[0], "cantidad": r[1]} for r in cur.fetchall()]
+            # Clasificados por categoría
+            cur.execute("""
+                SELECT NULLIF(categoria, ''), cantidad
+                FROM resumen_categorias
+                WHERE cantidad > 0
+                ORDER BY cantidad DESC;
+            """)
+            por_categoria = [{"categoria": r[0], "cantidad": r[1]} for r in cur.fetchall()]
 
-        # Clasificados por usuario
-        cur.execute("""
-            SELECT username, COUNT(*)
-            FROM clasificaciones
-            GROUP BY username
-            ORDER BY COUNT(*) DESC;
-        """)
-        por_usuario = [{"username": r[0], "cantidad": r[1]} for r in cur.fetchall()]
+            # Clasificados por usuario
+            cur.execute("""
+                SELECT NULLIF(username, ''), cantidad
+                FROM resumen_usuarios
+                WHERE cantidad > 0
+                ORDER BY cantidad DESC;
+            """)
+            por_usuario = [{"username": r[0], "cantidad": r[1]} for r in cur.fetchall()]
 
-        # Categoría más usada
-        cur.execute("""
-            SELECT categoria, COUNT(*) AS cnt
-            FROM clasificaciones
-            GROUP BY categoria
-            ORDER BY cnt DESC LIMIT 1;
-        """)
-        top_categoria_row = cur.fetchone()
-        top_categoria = {
-            "categoria": top_categoria_row[0],
-            "cantidad": top_categoria_row[1]
-        } if top_categoria_row else None
+            cur.close()
 
-        cur.close()
-        conn.close()
+        # Total documentos clasificados y categoría más usada
+        total_docs = sum(c["cantidad"] for c in por_categoria)
+        top_categoria = por_categoria[0] if por_categoria else None
 
         # -------- LEER METRICAS DE SMAV --------
         prometheus_raw = ""
@@ -541,67 +515,61 @@ def admin_metrics(request: Request, user: dict = Depends(get_current_user_by_req
         return HTMLResponse("<p>Error obteniendo métricas</p>", status_code=500)
 
 @app.get("/admin/metrics/uploaded-documents", response_class=HTMLResponse)
-def metrics_uploaded_documents(request: Request, user: dict = Depends(get_current_user_by_request)):
+def metrics_uploaded_documents(request: Request, desde: str = None, hasta: str = None,
+                               formato: str = CONFUSION_MATRIX_FORMAT,
+                               user: dict = Depends(get_current_user_by_request)):
     if user["rol"] != "admin":
         raise HTTPException(status_code=403, detail="No autorizado")
+    if formato not in CONFUSION_MATRIX_FORMATS:
+        return HTMLResponse(f"<p>Formato no soportado: use {', '.join(CONFUSION_MATRIX_FORMATS)}.</p>", status_code=400)
     try:
-        conn = get_db_conn()
-        cur = conn.cursor()
-        # Traemos las columnas que necesitamos
-        cur.execute("SELECT smav_pred, ground_truth FROM clasificaciones;")
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        if not rows:
-            return HTMLResponse("<p>No hay registros en la base de datos para calcular métricas.</p>", status_code=400)
-
-        true_labels = []
-        predicted_labels = []
-
-        for r in rows:
-            smav_pred = r[0] or None
-            ground = r[1] or None
-            # Añadimos sólo pares válidos
-            if ground and smav_pred:
-                true_labels.append(ground)
-                predicted_labels.append(smav_pred)
+        desde_dia = date.fromisoformat(desde) if desde else None
+        hasta_dia = date.fromisoformat(hasta) if hasta else None
+    except ValueError:
+        return HTMLResponse("<p>Fechas inválidas: use el formato AAAA-MM-DD.</p>", status_code=400)
+    try:
+        # Conteos agregados de la matriz de confusión (ver migrations.py),
+        # opcionalmente limitados a una ventana de días
+        conditions, params = [], []
+        if desde_dia:
+            conditions.append("dia >= %s")
+            params.append(desde_dia)
+        if hasta_dia:
+            conditions.append("dia <= %s")
+            params.append(hasta_dia)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT ground_truth, smav_pred, SUM(cantidad)::bigint
+                FROM matriz_confusion
+                {where}
+                GROUP BY ground_truth, smav_pred;
+            """, params)
+            counts = cur.fetchall()
+            cur.close()
 
-        if not true_labels:
+        evaluation = metrics_from_counts(counts)
+        if not evaluation["labels"]:
             return HTMLResponse("<p>No hay pares ground-truth / smav_pred válidos para calcular métricas.</p>", status_code=400)
 
-        all_labels = sorted(list(set(true_labels) | set(predicted_labels)))
-        precision, recall, fscore, support = precision_recall_fscore_support(
-            true_labels, predicted_labels, labels=all_labels, zero_division=0
-        )
-        accuracy = accuracy_score(true_labels, predicted_labels)
-        f1_macro = fscore.mean()
-
-        # Matriz de confusión
-        cm = confusion_matrix(true_labels, predicted_labels, labels=all_labels)
-        fig, ax = plt.subplots(figsize=(6, 6))
-        im = ax.imshow(cm, cmap='Blues')
-        ax.set_xticks(range(len(all_labels)))
-        ax.set_yticks(range(len(all_labels)))
-        ax.set_xticklabels(all_labels, rotation=45, ha='right')
-        ax.set_yticklabels(all_labels)
-        plt.colorbar(im)
-        buf = io.BytesIO()
-        plt.tight_layout()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
+        all_labels = evaluation["labels"]
+
+        # Matriz de confusión: se cachea por contenido, así que solo se vuelve
+        # a dibujar cuando cambian los conteos
+        cm = tuple(tuple(row) for row in evaluation["confusion_matrix"])
+        confusion_matrix_img = render_confusion_matrix(tuple(all_labels), cm, formato)
 
         metrics_output = {
             "labels": all_labels,
-            "precision": precision.tolist(),
-            "recall": recall.tolist(),
-            "fscore": fscore.tolist(),
-            "support": support.tolist(),
-            "accuracy": accuracy,
-            "f1_macro": f1_macro,
-            "confusion_matrix_img": img_base64
+            "precision": evaluation["precision"],
+            "recall": evaluation["recall"],
+            "fscore": evaluation["fscore"],
+            "support": evaluation["support"],
+            "accuracy": evaluation["accuracy"],
+            "f1_macro": evaluation["f1_macro"],
+            "confusion_matrix_img": confusion_matrix_img,
+            "confusion_matrix_format": formato
         }
 
         return templates.TemplateResponse("metrics.html", {
@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 import time
 
 FRONTEND_VISITS = Counter(
@@ -20,3 +20,40 @@ DASHBOARD_RENDER_TIME = Histogram(
     "frontend_dashboard_render_seconds",
     "Tiempo de renderización del dashboard"
 )
+
+# Pool de conexiones PostgreSQL (db.py)
+DB_POOL_MAX_SIZE = Gauge(
+    "db_pool_max_connections",
+    "Tamaño máximo del pool de conexiones PostgreSQL"
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Conexiones del pool prestadas en este momento"
+)
+DB_POOL_IDLE = Gauge(
+    "db_pool_connections_idle",
+    "Conexiones abiertas y libres en el pool"
+)
+DB_POOL_WAIT_TIME = Histogram(
+    "db_pool_wait_seconds",
+    "Tiempo esperando una conexión libre del pool"
+)
+DB_POOL_DISCARDED = Counter(
+    "db_pool_discarded_total",
+    "Conexiones descartadas por fallar la comprobación de salud"
+)
+
+# Cola de trabajos de subida (jobs.py)
+UPLOAD_JOBS_ENQUEUED = Counter(
+    "frontend_upload_jobs_enqueued_total",
+    "Trabajos de subida encolados"
+)
+UPLOAD_JOBS_FINISHED = Counter(
+    "frontend_upload_jobs_finished_total",
+    "Trabajos de subida terminados, por estado final",
+    ["estado"]
+)
+UPLOAD_JOB_DURATION = Histogram(
+    "frontend_upload_job_seconds",
+    "Tiempo de procesamiento de cada trabajo de subida"
+)
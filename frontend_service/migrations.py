@@ -0,0 +1,227 @@
+# migrations.py
+# Migraciones del esquema: se aplican en orden y una sola vez, registrándolas
+# en la tabla schema_migrations.
+import logging
+
+logger = logging.getLogger("frontend")
+
+# Clave del advisory lock que evita que dos workers migren a la vez
+MIGRATIONS_LOCK_ID = 727001
+
+MIGRATIONS = [
+    ("001_clasificaciones_columnas", """
+        ALTER TABLE clasificaciones
+            ADD COLUMN IF NOT EXISTS filename TEXT,
+            ADD COLUMN IF NOT EXISTS smav_pred VARCHAR(255),
+            ADD COLUMN IF NOT EXISTS classifier_pred VARCHAR(255),
+            ADD COLUMN IF NOT EXISTS ground_truth VARCHAR(255),
+            ADD COLUMN IF NOT EXISTS confidence NUMERIC;
+        ALTER TABLE clasificaciones ALTER COLUMN fecha SET DEFAULT NOW();
+    """),
+    # Índices para la paginación por cursor (fecha, id) del historial
+    ("002_indices_historial", """
+        CREATE INDEX IF NOT EXISTS idx_clasificaciones_fecha
+            ON clasificaciones (fecha DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_clasificaciones_username_fecha
+            ON clasificaciones (username, fecha DESC, id DESC);
+    """),
+    # Conteos por categoría y por usuario mantenidos por triggers, para que los
+    # paneles de administración no recorran toda la tabla. Los NULL se guardan
+    # como '' porque forman parte de la clave primaria.
+    ("003_resumen_clasificaciones", """
+        CREATE TABLE IF NOT EXISTS resumen_categorias (
+            categoria VARCHAR(255) PRIMARY KEY,
+            cantidad BIGINT NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS resumen_usuarios (
+            username VARCHAR(100) PRIMARY KEY,
+            cantidad BIGINT NOT NULL DEFAULT 0
+        );
+
+        CREATE OR REPLACE FUNCTION actualizar_resumen_clasificaciones() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE resumen_categorias r SET cantidad = r.cantidad - d.n
+                FROM (SELECT COALESCE(categoria, '') AS categoria, COUNT(*) AS n
+                      FROM filas_viejas GROUP BY 1) d
+                WHERE r.categoria = d.categoria;
+                UPDATE resumen_usuarios r SET cantidad = r.cantidad - d.n
+                FROM (SELECT COALESCE(username, '') AS username, COUNT(*) AS n
+                      FROM filas_viejas GROUP BY 1) d
+                WHERE r.username = d.username;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO resumen_categorias (categoria, cantidad)
+                SELECT COALESCE(categoria, ''), COUNT(*) FROM filas_nuevas GROUP BY 1
+                ON CONFLICT (categoria) DO UPDATE
+                SET cantidad = resumen_categorias.cantidad + EXCLUDED.cantidad;
+                INSERT INTO resumen_usuarios (username, cantidad)
+                SELECT COALESCE(username, ''), COUNT(*) FROM filas_nuevas GROUP BY 1
+                ON CONFLICT (username) DO UPDATE
+                SET cantidad = resumen_usuarios.cantidad + EXCLUDED.cantidad;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION vaciar_resumen_clasificaciones() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM resumen_categorias;
+            DELETE FROM resumen_usuarios;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Se bloquean las escrituras mientras se cargan los conteos iniciales
+        LOCK TABLE clasificaciones IN SHARE ROW EXCLUSIVE MODE;
+
+        DROP TRIGGER IF EXISTS trg_resumen_insert ON clasificaciones;
+        DROP TRIGGER IF EXISTS trg_resumen_update ON clasificaciones;
+        DROP TRIGGER IF EXISTS trg_resumen_delete ON clasificaciones;
+        DROP TRIGGER IF EXISTS trg_resumen_truncate ON clasificaciones;
+        CREATE TRIGGER trg_resumen_insert AFTER INSERT ON clasificaciones
+            REFERENCING NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_clasificaciones();
+        CREATE TRIGGER trg_resumen_update AFTER UPDATE ON clasificaciones
+            REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_clasificaciones();
+        CREATE TRIGGER trg_resumen_delete AFTER DELETE ON clasificaciones
+            REFERENCING OLD TABLE AS filas_viejas
+            FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_clasificaciones();
+        CREATE TRIGGER trg_resumen_truncate AFTER TRUNCATE ON clasificaciones
+            FOR EACH STATEMENT EXECUTE FUNCTION vaciar_resumen_clasificaciones();
+
+        DELETE FROM resumen_categorias;
+        DELETE FROM resumen_usuarios;
+        INSERT INTO resumen_categorias (categoria, cantidad)
+        SELECT COALESCE(categoria, ''), COUNT(*) FROM clasificaciones GROUP BY 1;
+        INSERT INTO resumen_usuarios (username, cantidad)
+        SELECT COALESCE(username, ''), COUNT(*) FROM clasificaciones GROUP BY 1;
+    """),
+    # Matriz de confusión (ground_truth x smav_pred) agregada por día, mantenida
+    # por triggers; solo cuenta los pares con ambas etiquetas informadas
+    ("004_matriz_confusion", """
+        CREATE TABLE IF NOT EXISTS matriz_confusion (
+            dia DATE NOT NULL,
+            ground_truth VARCHAR(255) NOT NULL,
+            smav_pred VARCHAR(255) NOT NULL,
+            cantidad BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, ground_truth, smav_pred)
+        );
+
+        CREATE OR REPLACE FUNCTION actualizar_matriz_confusion() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE matriz_confusion m SET cantidad = m.cantidad - d.n
+                FROM (SELECT COALESCE(fecha::date, DATE '1970-01-01') AS dia,
+                             ground_truth, smav_pred, COUNT(*) AS n
+                      FROM filas_viejas
+                      WHERE ground_truth <> '' AND smav_pred <> ''
+                      GROUP BY 1, 2, 3) d
+                WHERE m.dia = d.dia AND m.ground_truth = d.ground_truth AND m.smav_pred = d.smav_pred;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO matriz_confusion (dia, ground_truth, smav_pred, cantidad)
+                SELECT COALESCE(fecha::date, DATE '1970-01-01'), ground_truth, smav_pred, COUNT(*)
+                FROM filas_nuevas
+                WHERE ground_truth <> '' AND smav_pred <> ''
+                GROUP BY 1, 2, 3
+                ON CONFLICT (dia, ground_truth, smav_pred) DO UPDATE
+                SET cantidad = matriz_confusion.cantidad + EXCLUDED.cantidad;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION vaciar_matriz_confusion() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM matriz_confusion;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        LOCK TABLE clasificaciones IN SHARE ROW EXCLUSIVE MODE;
+
+        DROP TRIGGER IF EXISTS trg_matriz_insert ON clasificaciones;
+        DROP TRIGGER IF EXISTS trg_matriz_update ON clasificaciones;
+        DROP TRIGGER IF EXISTS trg_matriz_delete ON clasificaciones;
+        DROP TRIGGER IF EXISTS trg_matriz_truncate ON clasificaciones;
+        CREATE TRIGGER trg_matriz_insert AFTER INSERT ON clasificaciones
+            REFERENCING NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT EXECUTE FUNCTION actualizar_matriz_confusion();
+        CREATE TRIGGER trg_matriz_update AFTER UPDATE ON clasificaciones
+            REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT EXECUTE FUNCTION actualizar_matriz_confusion();
+        CREATE TRIGGER trg_matriz_delete AFTER DELETE ON clasificaciones
+            REFERENCING OLD TABLE AS filas_viejas
+            FOR EACH STATEMENT EXECUTE FUNCTION actualizar_matriz_confusion();
+        CREATE TRIGGER trg_matriz_truncate AFTER TRUNCATE ON clasificaciones
+            FOR EACH STATEMENT EXECUTE FUNCTION vaciar_matriz_confusion();
+
+        DELETE FROM matriz_confusion;
+        INSERT INTO matriz_confusion (dia, ground_truth, smav_pred, cantidad)
+        SELECT COALESCE(fecha::date, DATE '1970-01-01'), ground_truth, smav_pred, COUNT(*)
+        FROM clasificaciones
+        WHERE ground_truth <> '' AND smav_pred <> ''
+        GROUP BY 1, 2, 3;
+    """),
+    # Cola de trabajos de subida (jobs.py)
+    ("005_upload_jobs", """
+        CREATE TABLE IF NOT EXISTS upload_jobs (
+            id UUID PRIMARY KEY,
+            username VARCHAR(100),
+            filename TEXT NOT NULL,
+            content_type TEXT,
+            object_name TEXT NOT NULL,
+            estado VARCHAR(20) NOT NULL DEFAULT 'pendiente'
+                CHECK (estado IN ('pendiente', 'procesando', 'completado', 'error')),
+            resultado JSONB,
+            error TEXT,
+            intentos INT NOT NULL DEFAULT 0,
+            creado_en TIMESTAMP DEFAULT NOW(),
+            actualizado_en TIMESTAMP DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS idx_upload_jobs_pendientes
+            ON upload_jobs (creado_en) WHERE estado = 'pendiente';
+        CREATE INDEX IF NOT EXISTS idx_upload_jobs_procesando
+            ON upload_jobs (actualizado_en) WHERE estado = 'procesando';
+    """),
+    # rebuild_from_minio borra por filename en cada lote antes de insertar
+    ("006_indice_filename", """
+        CREATE INDEX IF NOT EXISTS idx_clasificaciones_filename
+            ON clasificaciones (filename);
+    """),
+    # Espera entre reintentos de un trabajo de subida y una sola clasificación
+    # por trabajo aunque se reintente después de guardarla (jobs.py)
+    ("007_reintentos_upload_jobs", """
+        ALTER TABLE upload_jobs
+            ADD COLUMN IF NOT EXISTS disponible_en TIMESTAMP NOT NULL DEFAULT NOW();
+        DROP INDEX IF EXISTS idx_upload_jobs_pendientes;
+        CREATE INDEX IF NOT EXISTS idx_upload_jobs_pendientes
+            ON upload_jobs (creado_en, disponible_en) WHERE estado = 'pendiente';
+        ALTER TABLE clasificaciones ADD COLUMN IF NOT EXISTS job_id UUID;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_clasificaciones_job_id
+            ON clasificaciones (job_id);
+    """),
+]
+
+
+def apply_migrations(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATIONS_LOCK_ID,))
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(100) PRIMARY KEY,
+            aplicada_en TIMESTAMP DEFAULT NOW()
+        );
+    """)
+    cur.execute("SELECT version FROM schema_migrations;")
+    applied = {row[0] for row in cur.fetchall()}
+    for version, sql in MIGRATIONS:
+        if version in applied:
+            continue
+        cur.execute(sql)
+        cur.execute("INSERT INTO schema_migrations (version) VALUES (%s);", (version,))
+        logger.info("Migración aplicada: %s", version)
+    conn.commit()
+    cur.close()
@@ -2,12 +2,15 @@
 # rebuild_from_minio.py
 import os
 import io
+import json
 import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import requests
-import psycopg2
 from minio import Minio
-from psycopg2.extras import RealDictCursor
-from preprocess import clean_text
+from psycopg2.extras import RealDictCursor, execute_values
+from db import get_conn, close_pool
 
 MINIO_ENDPOINT = os.getenv("MINIO_HOST", "minio:9000")
 MINIO_ACCESS_KEY = os.getenv("MINIO_ROOT_USER", "admin")
@@ -15,16 +18,22 @@ MINIO_SECRET_KEY = os.getenv("MINIO_ROOT_PASSWORD", "admin123")
 BUCKET = os.getenv("MINIO_BUCKET_INCOMING", "incoming-docs")
 
 OCR_URL = os.getenv("OCR_URL", "http://ocr_service:8000/extract-text")
+# OCR a partir de la referencia al objeto: el servicio lo lee de MinIO en streaming
+OCR_OBJECT_URL = os.getenv("OCR_OBJECT_URL", "http://ocr_service:8000/extract-text-object")
+OCR_BATCH_URL = os.getenv("OCR_BATCH_URL", "http://ocr_service:8000/extract-text-batch")
 SMAV_PROCESS_URL = os.getenv("SMAV_PROCESS_URL", "http://smav_service:8000/process-document")
 CLASSIFIER_URL = os.getenv("CLASSIFIER_URL", "http://classifier_service:8080/classify-text")
+SMAV_CLASSIFY_URL = os.getenv("SMAV_CLASSIFY_URL", "http://smav_service:8000/classify-text")
 
-DB_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST", "postgres"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-    "database": os.getenv("POSTGRES_DB", "doc_classifier"),
-    "user": os.getenv("POSTGRES_USER", "admin"),
-    "password": os.getenv("POSTGRES_PASSWORD", "admin123"),
-}
+# Valores por defecto del modo concurrente (se pueden cambiar por línea de comandos)
+REBUILD_WORKERS = int(os.getenv("REBUILD_WORKERS", 4))
+REBUILD_BATCH_SIZE = int(os.getenv("REBUILD_BATCH_SIZE", 50))
+# Objetos por petición a /extract-text-batch; 0 = una petición de OCR por objeto
+REBUILD_OCR_BATCH = int(os.getenv("REBUILD_OCR_BATCH", 16))
+# Peticiones por segundo máximas a cada servicio; 0 = sin límite
+REBUILD_OCR_RPS = float(os.getenv("REBUILD_OCR_RPS", 0))
+REBUILD_SMAV_RPS = float(os.getenv("REBUILD_SMAV_RPS", 0))
+REBUILD_CLASSIFIER_RPS = float(os.getenv("REBUILD_CLASSIFIER_RPS", 0))
 
 minio_client = Minio(
     MINIO_ENDPOINT.replace("http://", "").replace("https://", ""),
@@ -33,93 +42,383 @@ minio_client = Minio(
     secure=False
 )
 
-def get_db_conn():
-    return psycopg2.connect(**DB_CONFIG)
-
 def ensure_table():
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS clasificaciones (
-            id SERIAL PRIMARY KEY,
-            filename TEXT,
-            texto TEXT,
-            categoria VARCHAR(255),
-            fecha TIMESTAMP DEFAULT NOW(),
-            username VARCHAR(100),
-            smav_pred VARCHAR(255),
-            classifier_pred VARCHAR(255),
-            ground_truth VARCHAR(255),
-            confidence NUMERIC
-        );
-    """)
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def process_object(obj_name):
-    print("Procesando:", obj_name)
-    data = minio_client.get_object(BUCKET, obj_name)
-    content = data.read()
-    data.close()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS clasificaciones (
+                id SERIAL PRIMARY KEY,
+                filename TEXT,
+                texto TEXT,
+                categoria VARCHAR(255),
+                fecha TIMESTAMP DEFAULT NOW(),
+                username VARCHAR(100),
+                smav_pred VARCHAR(255),
+                classifier_pred VARCHAR(255),
+                ground_truth VARCHAR(255),
+                confidence NUMERIC
+            );
+        """)
+        # La tabla puede haberla creado otro servicio sin la columna filename
+        cur.execute("ALTER TABLE clasificaciones ADD COLUMN IF NOT EXISTS filename TEXT;")
+        # Objetos ya procesados (con su ETag) y ejecuciones completadas
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS rebuild_checkpoints (
+                object_name TEXT PRIMARY KEY,
+                etag TEXT NOT NULL,
+                procesado_en TIMESTAMPTZ DEFAULT NOW()
+            );
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS rebuild_runs (
+                id SERIAL PRIMARY KEY,
+                inicio TIMESTAMPTZ DEFAULT NOW(),
+                fin TIMESTAMPTZ
+            );
+        """)
+        conn.commit()
+        cur.close()
+
+def load_checkpoints():
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT object_name, etag FROM rebuild_checkpoints;")
+        checkpoints = dict(cur.fetchall())
+        cur.close()
+    return checkpoints
+
+def last_completed_run():
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT MAX(inicio) FROM rebuild_runs WHERE fin IS NOT NULL;")
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else None
+
+def start_run():
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO rebuild_runs (inicio) VALUES (NOW()) RETURNING id;")
+        run_id = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    return run_id
+
+def finish_run(run_id):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE rebuild_runs SET fin = NOW() WHERE id = %s;", (run_id,))
+        conn.commit()
+        cur.close()
+
+class RateLimiter:
+    """Limita las peticiones por segundo a un servicio, compartido entre hilos."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
 
+
+_local = threading.local()
+
+def get_session():
+    # Una sesión por hilo para reutilizar conexiones keep-alive
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+def ocr_object(session, obj_name, limiters):
+    """OCR de un objeto; devuelve (texto, ocr_ok)."""
     try:
-        resp = requests.post(OCR_URL, files={"file": (obj_name, content)}, timeout=60)
+        limiters["ocr"].wait()
+        resp = session.post(OCR_OBJECT_URL, json={"bucket": BUCKET, "object_name": obj_name}, timeout=60)
         if resp.ok:
             ocr_json = resp.json()
-            texto = ocr_json.get("extracted_text", "")
-        else:
-            print("OCR failed:", resp.status_code)
-            texto = ""
+            return ocr_json.get("extracted_text", ""), True
+        print("OCR failed:", obj_name, resp.status_code)
+    except Exception as e:
+        print("OCR exception:", obj_name, e)
+    return "", False
+
+def ocr_batch(obj_names, limiters):
+    """OCR de varios objetos en una sola petición.
+
+    Genera (object_name, (texto, ocr_ok)) según el servicio va terminando cada
+    documento; si la respuesta se corta, los objetos que falten no aparecen.
+    """
+    session = get_session()
+    try:
+        limiters["ocr"].wait()
+        payload = {"objects": [{"bucket": BUCKET, "object_name": name} for name in obj_names]}
+        with session.post(OCR_BATCH_URL, json=payload, stream=True, timeout=(10, 600)) as resp:
+            if not resp.ok:
+                print("OCR batch failed:", resp.status_code)
+                return
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                result = json.loads(line)
+                if "error" in result:
+                    print("OCR failed:", result["object_name"], result["error"])
+                    yield result["object_name"], ("", False)
+                else:
+                    yield result["object_name"], (result.get("extracted_text", ""), True)
     except Exception as e:
-        print("OCR exception:", e)
-        texto = ""
+        print("OCR batch exception:", e)
+
+def process_object(obj_name, limiters, ocr=None):
+    """Pasa un objeto por OCR, SMAV y el clasificador.
+
+    Si ya se tiene el OCR (modo por lotes) se pasa en `ocr` como (texto, ocr_ok).
+    Devuelve la fila a insertar y si el OCR terminó bien; si falló no hay fila:
+    un fallo pasajero no debe reemplazar una clasificación buena ya guardada.
+    """
+    session = get_session()
+    if ocr is None:
+        ocr = ocr_object(session, obj_name, limiters)
+    texto, ocr_ok = ocr
+    if not ocr_ok:
+        return None, False
 
     smav_categoria = None
     smav_conf = None
     try:
-        resp = requests.post("http://smav_service:8000/classify-text", json={"text": texto}, timeout=30)
+        limiters["smav"].wait()
+        resp = session.post(SMAV_CLASSIFY_URL, json={"text": texto}, timeout=30)
         if resp.ok:
             j = resp.json()
             smav_categoria = j.get("categoria") or None
             smav_conf = j.get("confianza") or j.get("confidence") or None
         else:
-            print("SMAV classify failed:", resp.status_code)
+            print("SMAV classify failed:", obj_name, resp.status_code)
     except Exception as e:
-        print("SMAV classify exception:", e)
+        print("SMAV classify exception:", obj_name, e)
 
     classifier_pred = None
     try:
         if texto:
-            resp = requests.post(CLASSIFIER_URL, json={"text": texto}, timeout=30)
+            limiters["classifier"].wait()
+            resp = session.post(CLASSIFIER_URL, json={"text": texto}, timeout=30)
             if resp.ok:
                 j = resp.json()
                 classifier_pred = j.get("categoria") or j.get("category") or None
     except Exception as e:
-        print("Classifier exception:", e)
+        print("Classifier exception:", obj_name, e)
 
-    try:
-        conn = get_db_conn()
+    row = (obj_name, texto[:10000], smav_categoria, smav_categoria, classifier_pred, classifier_pred, smav_conf)
+    return row, ocr_ok
+
+def is_pending(obj, since, checkpoints):
+    """Si hay que procesar el objeto: modificado desde la última ejecución
+    completa (modo incremental) y sin checkpoint con su ETag actual."""
+    if since and obj.last_modified and obj.last_modified <= since:
+        return False
+    return checkpoints.get(obj.object_name) != obj.etag
+
+
+class PendingWrites:
+    """Filas y checkpoints acumulados entre escrituras, y cuántos objetos no
+    llegaron a guardarse. Solo una ejecución sin fallos se marca como completa:
+    el modo incremental parte de la última completa y así vuelve a intentar
+    los objetos que fallaron."""
+
+    def __init__(self, insert=None):
+        self._insert = insert or insert_rows
+        self.rows = []
+        self.checkpoints = []
+        self.inserted = 0
+        self.failed = 0
+
+    def add(self, obj_name, etag, row, ocr_ok):
+        if not ocr_ok:
+            self.failed += 1
+            return
+        self.rows.append(row)
+        self.checkpoints.append((obj_name, etag))
+
+    def add_error(self):
+        self.failed += 1
+
+    def __len__(self):
+        return len(self.rows)
+
+    def flush(self):
+        try:
+            self._insert(self.rows, self.checkpoints)
+            self.inserted += len(self.rows)
+        except Exception as e:
+            print("DB insert failed:", len(self.rows), "rows:", e)
+            self.failed += len(self.rows)
+        self.rows = []
+        self.checkpoints = []
+
+    @property
+    def clean(self):
+        return self.failed == 0
+
+
+def insert_rows(rows, checkpoints):
+    """Guarda las filas y los checkpoints (object_name, etag) en la misma transacción.
+
+    Las filas anteriores de esos objetos se borran para que reprocesar un
+    objeto no deje duplicados.
+    """
+    if not rows:
+        return
+    with get_conn() as conn:
         cur = conn.cursor()
-        cur.execute("""
+        cur.execute(
+            "DELETE FROM clasificaciones WHERE filename = ANY(%s);",
+            ([row[0] for row in rows],)
+        )
+        execute_values(cur, """
             INSERT INTO clasificaciones
             (filename, texto, categoria, fecha, smav_pred, classifier_pred, ground_truth, confidence)
-            VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s)
-        """, (obj_name, texto[:10000], smav_categoria, smav_categoria, classifier_pred, classifier_pred, smav_conf))
+            VALUES %s
+        """, rows, template="(%s, %s, %s, NOW(), %s, %s, %s, %s)", page_size=len(rows))
+        if checkpoints:
+            execute_values(cur, """
+                INSERT INTO rebuild_checkpoints (object_name, etag) VALUES %s
+                ON CONFLICT (object_name) DO UPDATE
+                SET etag = EXCLUDED.etag, procesado_en = NOW()
+            """, checkpoints, page_size=len(checkpoints))
         conn.commit()
         cur.close()
-        conn.close()
-    except Exception as e:
-        print("DB insert failed:", e)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reprocesa los documentos de MinIO y reconstruye 'clasificaciones'.")
+    parser.add_argument("--workers", type=int, default=REBUILD_WORKERS,
+                        help="Objetos procesados en paralelo")
+    parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE,
+                        help="Filas por INSERT en la base de datos")
+    parser.add_argument("--ocr-batch", type=int, default=REBUILD_OCR_BATCH,
+                        help="Objetos por petición de OCR por lotes (0 = uno por petición)")
+    parser.add_argument("--ocr-rps", type=float, default=REBUILD_OCR_RPS,
+                        help="Máximo de peticiones/segundo al OCR (0 = sin límite)")
+    parser.add_argument("--smav-rps", type=float, default=REBUILD_SMAV_RPS,
+                        help="Máximo de peticiones/segundo a SMAV (0 = sin límite)")
+    parser.add_argument("--classifier-rps", type=float, default=REBUILD_CLASSIFIER_RPS,
+                        help="Máximo de peticiones/segundo al clasificador (0 = sin límite)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Solo objetos modificados desde la última ejecución completa")
+    parser.add_argument("--force", action="store_true",
+                        help="Ignora los checkpoints y reprocesa todos los objetos")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    limiters = {
+        "ocr": RateLimiter(args.ocr_rps),
+        "smav": RateLimiter(args.smav_rps),
+        "classifier": RateLimiter(args.classifier_rps),
+    }
     ensure_table()
-    for obj in minio_client.list_objects(BUCKET, recursive=True):
-        try:
-            process_object(obj.object_name)
-            time.sleep(0.2)
-        except Exception as e:
-            print("Error processing object", obj.object_name, e)
+    checkpoints = {} if args.force else load_checkpoints()
+    since = last_completed_run() if args.incremental else None
+    if since:
+        print("Modo incremental: objetos modificados desde", since)
+    run_id = start_run()
+
+    start = time.monotonic()
+    done = 0
+    errors = 0
+    skipped = 0
+    pending = PendingWrites()
+    in_flight = {}
+
+    def collect(finished):
+        nonlocal done, errors
+        for future in finished:
+            obj_name, etag = in_flight.pop(future)
+            try:
+                row, ocr_ok = future.result()
+                pending.add(obj_name, etag, row, ocr_ok)
+                done += 1
+            except Exception as e:
+                errors += 1
+                pending.add_error()
+                print("Error processing object", obj_name, e)
+            if (done + errors) % 50 == 0:
+                elapsed = time.monotonic() - start
+                print(f"Progreso: {done + errors} objetos, {(done + errors) / elapsed:.2f} obj/s")
+
+    def pending_objects():
+        nonlocal skipped
+        for obj in minio_client.list_objects(BUCKET, recursive=True):
+            if not is_pending(obj, since, checkpoints):
+                skipped += 1
+                continue
+            yield obj
+
+    def chunks(objects, size):
+        chunk = []
+        for obj in objects:
+            chunk.append(obj)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            def submit(obj, ocr=None):
+                # Como mucho dos objetos en vuelo por worker: el listado no se
+                # carga entero en memoria
+                while len(in_flight) >= args.workers * 2:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                    if len(pending) >= args.batch_size:
+                        pending.flush()
+                print("Procesando:", obj.object_name)
+                future = executor.submit(process_object, obj.object_name, limiters, ocr)
+                in_flight[future] = (obj.object_name, obj.etag)
+
+            if args.ocr_batch > 0:
+                # El OCR de cada lote llega en streaming y, según termina cada
+                # documento, SMAV y el clasificador siguen en los workers
+                for chunk in chunks(pending_objects(), args.ocr_batch):
+                    by_name = {obj.object_name: obj for obj in chunk}
+                    for obj_name, ocr in ocr_batch(list(by_name), limiters):
+                        if obj_name in by_name:
+                            submit(by_name.pop(obj_name), ocr)
+                    # Los que no llegaron en el lote se reintentan uno a uno
+                    for obj in by_name.values():
+                        submit(obj)
+            else:
+                for obj in pending_objects():
+                    submit(obj)
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+                if len(pending) >= args.batch_size:
+                    pending.flush()
+        pending.flush()
+        if pending.clean:
+            finish_run(run_id)
+        else:
+            print(f"{pending.failed} objetos sin guardar: la ejecución no se marca como completa "
+                  f"y el modo incremental los volverá a intentar")
+    finally:
+        close_pool()
+
+    elapsed = time.monotonic() - start
+    total = done + errors
+    print("---- Resumen de la reconstrucción ----")
+    print(f"Objetos procesados: {done}  con error: {errors}  omitidos: {skipped}  filas insertadas: {pending.inserted}")
+    print(f"Tiempo total: {elapsed:.1f}s  rendimiento: {total / elapsed if elapsed else 0:.2f} obj/s  "
+          f"(workers={args.workers}, ocr_batch={args.ocr_batch})")
 
 if __name__ == "__main__":
     main()
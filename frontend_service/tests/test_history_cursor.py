@@ -0,0 +1,25 @@
+# test_history_cursor.py
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from main import decode_history_cursor, encode_history_cursor
+
+
+@pytest.mark.parametrize("fecha", [datetime(2024, 5, 1, 12, 30), datetime(2024, 5, 1, 12, 30, 0, 123456)])
+def test_round_trip(fecha):
+    cursor = encode_history_cursor(fecha, 42)
+    assert decode_history_cursor(cursor) == (fecha, 42)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_history_cursor(datetime(2024, 5, 1), 10 ** 12)
+    assert all(c.isalnum() or c in "-_=" for c in cursor)
+
+
+@pytest.mark.parametrize("cursor", ["", "no-es-base64!", "bm9wZQ==", "MjAyNC0wNS0wMXx4", "ñ"])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_history_cursor(cursor)
+    assert exc.value.status_code == 400
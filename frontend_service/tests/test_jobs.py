@@ -0,0 +1,147 @@
+# test_jobs.py
+# Transiciones de estado de la cola upload_jobs contra el sustituto en memoria
+# de PostgreSQL de los benchmarks
+import os
+import sys
+import asyncio
+from contextlib import contextmanager
+from datetime import timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "benchmarks"))
+
+import jobs
+import postgres_standin
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(postgres_standin, "POSTGRES_STANDIN_LATENCY_MS", 0)
+    monkeypatch.setattr(postgres_standin, "_jobs", {})
+    monkeypatch.setattr(postgres_standin, "_clasificaciones_jobs", set())
+
+    @contextmanager
+    def get_conn():
+        yield postgres_standin.Connection()
+
+    monkeypatch.setattr(jobs, "get_conn", get_conn)
+    return postgres_standin._jobs
+
+
+def enqueue(job_id="00000000-0000-0000-0000-000000000001"):
+    with jobs.get_conn() as conn:
+        conn.cursor().execute("""
+            INSERT INTO upload_jobs (id, username, filename, content_type, object_name)
+            VALUES (%s, %s, %s, %s, %s);
+        """, (job_id, "ana", "doc.pdf", "application/pdf", f"uploads/{job_id}/doc.pdf"))
+    return job_id
+
+
+def test_retry_delay_doubles_up_to_max(monkeypatch):
+    monkeypatch.setattr(jobs, "UPLOAD_RETRY_BACKOFF", 10)
+    monkeypatch.setattr(jobs, "UPLOAD_RETRY_BACKOFF_MAX", 30)
+    assert [jobs.retry_delay(n) for n in (1, 2, 3, 4)] == [10, 20, 30, 30]
+
+
+def test_claim_counts_attempt(queue):
+    job_id = enqueue()
+    job = jobs.claim_job()
+    assert job["job_id"] == job_id
+    assert job["intentos"] == 1
+    assert queue[job_id]["estado"] == "procesando"
+    assert jobs.claim_job() is None
+
+
+def test_retried_job_waits_for_backoff(queue):
+    job_id = enqueue()
+    job = jobs.claim_job()
+    jobs.retry_job(job_id, "SMAV caído", job["intentos"])
+
+    assert queue[job_id]["estado"] == "pendiente"
+    assert queue[job_id]["error"] == "SMAV caído"
+    assert jobs.claim_job() is None
+
+    queue[job_id]["disponible_en"] -= timedelta(seconds=jobs.retry_delay(1))
+    assert jobs.claim_job()["intentos"] == 2
+
+
+def test_finish_job(queue):
+    job_id = enqueue()
+    jobs.claim_job()
+    jobs.finish_job(job_id, "completado", {"categoria": "A"})
+    assert queue[job_id]["estado"] == "completado"
+    assert queue[job_id]["resultado"] == {"categoria": "A"}
+
+
+def run_worker_once(monkeypatch, job, fail_with):
+    calls = []
+    workers = jobs.UploadWorkers(minio_client=None, size=1)
+
+    def process_upload(minio_client, job):
+        raise fail_with
+
+    def record(name):
+        def call(*args):
+            calls.append((name, args))
+            workers._stopping = True
+        return call
+
+    monkeypatch.setattr(jobs, "claim_job", lambda: job)
+    monkeypatch.setattr(jobs, "process_upload", process_upload)
+    monkeypatch.setattr(jobs, "retry_job", record("retry_job"))
+    monkeypatch.setattr(jobs, "finish_job", record("finish_job"))
+    asyncio.run(workers._run())
+    return calls
+
+
+def test_worker_retries_until_max_attempts(monkeypatch):
+    monkeypatch.setattr(jobs, "UPLOAD_MAX_ATTEMPTS", 3)
+    job = {"job_id": "j1", "object_name": "uploads/j1/doc.pdf", "intentos": 2}
+    calls = run_worker_once(monkeypatch, job, RuntimeError("Error en SMAV: 503"))
+    assert calls == [("retry_job", ("j1", "Error en SMAV: 503", 2))]
+
+    job["intentos"] = 3
+    calls = run_worker_once(monkeypatch, job, RuntimeError("Error en SMAV: 503"))
+    assert calls == [("finish_job", ("j1", "error", None, "Error en SMAV: 503"))]
+
+
+class FakeObject:
+    def stream(self, size):
+        yield b"%PDF"
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class FakeResponse:
+    ok = True
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+def test_reprocessed_job_inserts_one_classification(queue, monkeypatch):
+    def post(url, **kwargs):
+        if url == jobs.SMAV_PROCESS_URL:
+            for _ in kwargs["data"]:
+                pass
+            return FakeResponse({"extracted_text": "texto", "final_category": "A"})
+        return FakeResponse({"categoria": "A"})
+
+    monkeypatch.setattr(jobs.requests, "post", post)
+    minio_client = type("Minio", (), {"get_object": lambda self, bucket, name: FakeObject()})()
+    job = {"job_id": enqueue(), "username": "ana", "filename": "doc.pdf",
+           "content_type": "application/pdf", "object_name": "uploads/doc.pdf"}
+    before = postgres_standin.stats()["clasificaciones"]
+
+    jobs.process_upload(minio_client, job)
+    jobs.process_upload(minio_client, job)
+    assert postgres_standin.stats()["clasificaciones"] == before + 1
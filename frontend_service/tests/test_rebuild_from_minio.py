@@ -0,0 +1,89 @@
+# test_rebuild_from_minio.py
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import rebuild_from_minio
+from rebuild_from_minio import PendingWrites, is_pending
+
+
+def obj(name, etag, last_modified=None):
+    return SimpleNamespace(object_name=name, etag=etag, last_modified=last_modified)
+
+
+def row(name):
+    return (name, "texto", "A", "A", "A", "A", 0.9)
+
+
+class FakeInsert:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, rows, checkpoints):
+        self.calls.append((list(rows), list(checkpoints)))
+        if self.fail:
+            raise RuntimeError("conexión perdida")
+
+
+def test_is_pending_uses_etag_checkpoint():
+    checkpoints = {"a.pdf": "e1"}
+    assert not is_pending(obj("a.pdf", "e1"), None, checkpoints)
+    assert is_pending(obj("a.pdf", "e2"), None, checkpoints)
+    assert is_pending(obj("b.pdf", "e1"), None, checkpoints)
+
+
+def test_is_pending_incremental_skips_objects_older_than_last_run():
+    since = datetime(2024, 1, 1)
+    assert not is_pending(obj("a.pdf", "e1", since - timedelta(days=1)), since, {})
+    assert is_pending(obj("a.pdf", "e1", since + timedelta(days=1)), since, {})
+
+
+def test_ocr_failure_adds_no_row_and_no_checkpoint():
+    insert = FakeInsert()
+    pending = PendingWrites(insert)
+    pending.add("a.pdf", "e1", row("a.pdf"), True)
+    pending.add("b.pdf", "e2", None, False)
+    pending.flush()
+
+    # La fila de b.pdf no se borra ni se reemplaza por una vacía
+    assert insert.calls == [([row("a.pdf")], [("a.pdf", "e1")])]
+    assert pending.inserted == 1
+    assert not pending.clean
+
+
+def test_failed_insert_marks_run_unclean():
+    pending = PendingWrites(FakeInsert(fail=True))
+    pending.add("a.pdf", "e1", row("a.pdf"), True)
+    pending.add("b.pdf", "e2", row("b.pdf"), True)
+    pending.flush()
+
+    assert len(pending) == 0
+    assert pending.inserted == 0
+    assert pending.failed == 2
+    assert not pending.clean
+
+
+def test_errors_mark_run_unclean():
+    pending = PendingWrites(FakeInsert())
+    pending.add_error()
+    assert not pending.clean
+
+
+def test_clean_run():
+    insert = FakeInsert()
+    pending = PendingWrites(insert)
+    pending.add("a.pdf", "e1", row("a.pdf"), True)
+    pending.flush()
+    pending.flush()
+    assert pending.clean
+    assert pending.inserted == 1
+
+
+def test_process_object_skips_services_when_ocr_failed(monkeypatch):
+    def fail(*args, **kwargs):
+        pytest.fail("no debe llamar a SMAV ni al clasificador")
+
+    monkeypatch.setattr(rebuild_from_minio, "get_session", lambda: SimpleNamespace(post=fail))
+    assert rebuild_from_minio.process_object("a.pdf", {}, ocr=("", False)) == (None, False)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# bench_preprocess.py
+# Compara los segundos de OCR por página sin preprocesado y con él, sobre
+# test1.png y páginas generadas que imitan escaneos a 600 DPI en color
+# (fondo tintado, inclinación y márgenes amplios).
+#
+#   python bench_preprocess.py --runs 3 --samples 3
+import os
+import time
+import random
+import difflib
+import argparse
+import statistics
+from PIL import Image, ImageDraw, ImageFont
+import pytesseract
+
+from preprocess import (
+    preprocess_image, binarize, crop_margins, estimate_skew,
+    OCR_PREPROCESS, PREPROCESS_STEPS,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGE = os.path.join(HERE, "..", "test1.png")
+
+WORDS = (
+    "factura contrato fecha importe cliente proveedor documento total pago "
+    "servicio dirección referencia número cuenta entrega pedido firma anexo"
+).split()
+
+
+def load_font(size):
+    for name in ("DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            pass
+    return ImageFont.load_default()
+
+
+def generated_page(seed, dpi=600):
+    """Página A4 a `dpi` con texto conocido; devuelve (imagen, texto)."""
+    rng = random.Random(seed)
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    page = Image.new("RGB", (width, height), (246, 240, 226))
+    draw = ImageDraw.Draw(page)
+    font = load_font(dpi // 6)
+    margin = dpi  # una pulgada de margen en blanco
+    lines = [" ".join(rng.choice(WORDS) for _ in range(6)) for _ in range(20)]
+    y = margin
+    for line in lines:
+        draw.text((margin, y), line, fill=(40, 40, 70), font=font)
+        y += dpi // 3
+    page = page.rotate(rng.uniform(-3, 3), resample=Image.BICUBIC, expand=True,
+                       fillcolor=(246, 240, 226))
+    page.info["dpi"] = (dpi, dpi)
+    return page, "\n".join(lines)
+
+
+def check_steps():
+    """Comprobación rápida de los pasos sobre una página sintética de dos
+    niveles (texto 20, papel 240) con márgenes y girada 3 grados."""
+    page = Image.new("L", (1000, 1400), 240)
+    draw = ImageDraw.Draw(page)
+    for y in range(300, 1000, 40):
+        draw.rectangle((250, y, 750, y + 12), fill=20)
+    for name, image in (("dos niveles", page), ("binarizada", binarize(page))):
+        cropped = crop_margins(image)
+        if cropped.width >= image.width or cropped.height >= image.height:
+            raise SystemExit(f"crop no recorta los márgenes de la página {name}: {cropped.size}")
+    angle = estimate_skew(page.rotate(3, fillcolor=240, expand=True))
+    if abs(angle + 3) > 0.5:
+        raise SystemExit(f"deskew estima {angle}° en una página girada 3°")
+
+
+def similarity(text, expected):
+    return difflib.SequenceMatcher(None, " ".join(text.split()), " ".join(expected.split())).ratio()
+
+
+def measure(image, expected, runs, steps):
+    results = {}
+    for mode in ("original", "preprocesado"):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            target = preprocess_image(image, steps) if mode == "preprocesado" else image
+            text = pytesseract.image_to_string(target)
+            times.append(time.perf_counter() - start)
+        results[mode] = {
+            "seconds": statistics.median(times),
+            "similarity": similarity(text, expected) if expected else None,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del preprocesado de imágenes para OCR")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--samples", type=int, default=3, help="Páginas generadas")
+    args = parser.parse_args()
+
+    pages = []
+    if os.path.exists(TEST_IMAGE):
+        image = Image.open(TEST_IMAGE)
+        image.load()
+        pages.append(("test1.png", image, None))
+    for i in range(args.samples):
+        image, text = generated_page(seed=i)
+        pages.append((f"generada_{i}", image, text))
+
+    check_steps()
+    # Sin OCR_PREPROCESS (desactivado por defecto) se comparan todos los pasos
+    steps = OCR_PREPROCESS or PREPROCESS_STEPS
+    print(f"Pasos de preprocesado: {', '.join(steps)}")
+    totals = {"original": [], "preprocesado": []}
+    for name, image, expected in pages:
+        results = measure(image, expected, args.runs, steps)
+        line = f"{name:14s} {image.width}x{image.height}"
+        for mode, r in results.items():
+            totals[mode].append(r["seconds"])
+            line += f"  {mode}={r['seconds']:.2f}s"
+            if r["similarity"] is not None:
+                line += f" (similitud {r['similarity']:.2f})"
+        print(line)
+
+    before = statistics.mean(totals["original"])
+    after = statistics.mean(totals["preprocesado"])
+    print(f"Media por página: original={before:.2f}s  preprocesado={after:.2f}s  "
+          f"aceleración={before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
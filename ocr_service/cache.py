@@ -0,0 +1,125 @@
+# cache.py
+# Caché de resultados OCR direccionada por contenido: SHA-256 del archivo más
+# la configuración de OCR. Nivel en memoria (LRU) y nivel opcional en disco
+# con expulsión por tamaño.
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", 1024))
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR")  # sin definir => sin nivel en disco
+OCR_CACHE_DISK_MAX_MB = int(os.getenv("OCR_CACHE_DISK_MAX_MB", 512))
+
+
+def make_key(file_digest, settings):
+    """Clave a partir del SHA-256 (hex) del archivo y la configuración de OCR."""
+    settings_json = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(f"{file_digest}:{settings_json}".encode("utf-8")).hexdigest()
+
+
+class OCRCache:
+    def __init__(self, max_items=OCR_CACHE_SIZE, disk_dir=OCR_CACHE_DIR,
+                 disk_max_bytes=OCR_CACHE_DISK_MAX_MB * 1024 * 1024):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._disk_bytes = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.txt")
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_mtime, st.st_size
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return text
+
+            if self.disk_dir:
+                path = self._disk_path(key)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                    # el mtime hace de marca de último uso para la expulsión
+                    os.utime(path)
+                except FileNotFoundError:
+                    text = None
+                if text is not None:
+                    self._remember(key, text)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return text
+
+            self.misses += 1
+            return None
+
+    def put(self, key, text):
+        with self._lock:
+            self._remember(key, text)
+            if not self.disk_dir:
+                return
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = text.encode("utf-8")
+            try:
+                previous = os.path.getsize(path)
+            except FileNotFoundError:
+                previous = 0
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._disk_bytes += len(data) - previous
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        # Se borran los más antiguos hasta quedar en el 90% del límite
+        target = self.disk_max_bytes * 0.9
+        for path, _, size in sorted(self._disk_entries(), key=lambda e: e[1]):
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._disk_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes if self.disk_dir else None,
+            }
@@ -0,0 +1,182 @@
+# engine.py
+# Motor de OCR paralelo: reparte las páginas entre un pool de procesos acotado
+# para no bloquear el event loop ni limitar el OCR a un solo núcleo.
+import os
+import re
+import time
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from preprocess import preprocess_image, preprocess_settings
+from tesseract import create_engine, ocr_options
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+# Rasterización por ventanas: solo OCR_PAGE_WINDOW páginas en memoria a la vez
+OCR_PAGE_WINDOW = int(os.getenv("OCR_PAGE_WINDOW", OCR_WORKERS))
+OCR_DPI = int(os.getenv("OCR_DPI", 200))
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "false").lower() in ("1", "true", "yes")
+
+_pool = None
+# Motor de Tesseract del proceso actual (uno por worker del pool)
+_engine = None
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine()
+    return _engine
+
+
+def init_worker():
+    # Se carga el modelo por defecto al arrancar el worker, no en la primera página
+    get_engine().load(**ocr_options())
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=init_worker)
+    return _pool
+
+
+def discard_pool(broken):
+    """Descarta un pool roto (un worker murió: OOM, fallo dentro de Tesseract
+    o de init_worker); la siguiente llamada a get_pool crea uno nuevo."""
+    global _pool
+    if _pool is broken:
+        _pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_pool(fn, *args):
+    # Si el pool está roto se recrea y se reintenta una vez; si vuelve a
+    # fallar, el error llega a quien hizo la petición
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = get_pool()
+        try:
+            return await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            discard_pool(pool)
+            if attempt:
+                raise
+            print(" Pool de OCR roto; se recrea y se reintenta la página")
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def ocr_image(image, options):
+    # Se ejecuta dentro de un proceso del pool, así que el preprocesado
+    # también se reparte entre núcleos
+    return get_engine().image_to_string(preprocess_image(image), **options)
+
+
+def ocr_page(image, options):
+    # Como ocr_image, pero devuelve también los segundos de OCR de la página
+    start = time.perf_counter()
+    text = ocr_image(image, options)
+    return text, time.perf_counter() - start
+
+
+async def ocr_pages(images, options):
+    """OCR concurrente de varias páginas; el resultado respeta el orden de entrada."""
+    return await asyncio.gather(*(run_in_pool(ocr_image, img, options) for img in images))
+
+
+async def iter_pages(images, options, first_page=1):
+    """Como ocr_pages, pero genera (página, texto, segundos) en orden según
+    termina cada una, sin esperar a las demás."""
+    tasks = [asyncio.ensure_future(run_in_pool(ocr_page, img, options)) for img in images]
+    try:
+        for page, task in enumerate(tasks, start=first_page):
+            text, seconds = await task
+            yield page, text, seconds
+    finally:
+        # Si el consumidor abandona (cliente desconectado) no se sigue con el resto
+        for task in tasks:
+            task.cancel()
+
+
+def ocr_settings(kind, options):
+    # Todo lo que cambia el texto resultante forma parte de la clave de caché
+    settings = {"kind": kind, "preprocess": preprocess_settings(), **options}
+    if kind == "pdf":
+        settings.update({"dpi": OCR_DPI, "grayscale": OCR_GRAYSCALE})
+    return settings
+
+
+def render_pages(pdf_path, first_page, last_page):
+    pages = convert_from_path(
+        pdf_path,
+        dpi=OCR_DPI,
+        grayscale=OCR_GRAYSCALE,
+        first_page=first_page,
+        last_page=last_page,
+    )
+    # El preprocesado necesita el DPI para reducir a OCR_TARGET_DPI
+    for page in pages:
+        page.info["dpi"] = (OCR_DPI, OCR_DPI)
+    return pages
+
+
+def page_windows(total_pages, size=OCR_PAGE_WINDOW):
+    # La primera ventana es de una sola página para que el primer resultado
+    # llegue tras rasterizar y reconocer una página, no una ventana entera
+    if total_pages < 1:
+        return []
+    return [(1, 1)] + [
+        (first, min(first + size - 1, total_pages))
+        for first in range(2, total_pages + 1, size)
+    ]
+
+
+async def iter_pdf_pages(pdf_path, options):
+    """OCR de un PDF por ventanas de páginas; genera (página, texto, segundos).
+
+    Mientras el pool procesa una ventana se rasteriza la siguiente, así que en
+    memoria nunca hay más de dos ventanas de imágenes, sea cual sea el tamaño
+    del documento.
+    """
+    loop = asyncio.get_running_loop()
+    info = await loop.run_in_executor(None, pdfinfo_from_path, pdf_path)
+    windows = page_windows(int(info["Pages"]))
+
+    next_render = None
+    if windows:
+        next_render = loop.run_in_executor(None, render_pages, pdf_path, *windows[0])
+    for i in range(len(windows)):
+        images = await next_render
+        next_render = None
+        if i + 1 < len(windows):
+            next_render = loop.run_in_executor(None, render_pages, pdf_path, *windows[i + 1])
+        async for result in iter_pages(images, options, first_page=windows[i][0]):
+            yield result
+        del images
+
+
+async def ocr_pdf_path(pdf_path, options):
+    return [text async for _, text, _ in iter_pdf_pages(pdf_path, options)]
+
+
+def join_pages(page_texts, first_page=1):
+    return "".join(
+        f"\n--- Página {i} ---\n{page_text}"
+        for i, page_text in enumerate(page_texts, start=first_page)
+    )
+
+
+_PAGE_MARKER = re.compile(r"\n?--- Página (\d+) ---\n")
+
+
+def split_pages(text):
+    """Inversa de join_pages (tras strip): lista de (página, texto)."""
+    parts = _PAGE_MARKER.split(text)
+    return [(int(parts[i]), parts[i + 1]) for i in range(1, len(parts) - 1, 2)]
@@ -1,41 +1,227 @@
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import Optional, List
 from PIL import Image, UnidentifiedImageError
-from pdf2image import convert_from_bytes
-import pytesseract
-import io
+from minio.error import S3Error
+import os
+import json
+import time
+import asyncio
+
+from engine import (
+    ocr_pages, ocr_pdf_path, iter_pages, iter_pdf_pages, join_pages, split_pages,
+    ocr_settings, shutdown_pool, OCR_WORKERS,
+)
+from tesseract import ocr_options
+from cache import OCRCache, make_key
+from storage import spool_file, copy_upload, copy_object, MINIO_BUCKET_INCOMING
 
 app = FastAPI(title="OCR Service - Multi-format (Images & PDF)")
 
+ocr_cache = OCRCache()
+
+UNSUPPORTED_FORMAT = "Formato no compatible. Solo se aceptan JPG, PNG, TIFF, BMP y PDF."
+
+# /extract-text-batch: archivos por petición y archivos en OCR a la vez. Con
+# varios archivos en curso el pool siempre tiene páginas en cola.
+OCR_BATCH_MAX_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", 100))
+OCR_BATCH_CONCURRENCY = int(os.getenv("OCR_BATCH_CONCURRENCY", OCR_WORKERS))
+
+
+class ObjectRef(BaseModel):
+    object_name: str
+    bucket: str = MINIO_BUCKET_INCOMING
+    lang: Optional[str] = None
+    psm: Optional[int] = None
+    oem: Optional[int] = None
+
+
+class BatchObject(BaseModel):
+    object_name: str
+    bucket: str = MINIO_BUCKET_INCOMING
+
+
+class BatchRequest(BaseModel):
+    objects: List[BatchObject]
+    lang: Optional[str] = None
+    psm: Optional[int] = None
+    oem: Optional[int] = None
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    shutdown_pool()
+
 @app.get("/")
 def read_root():
     return {"message": "OCR API is running correctly! Supports JPG, PNG, TIFF, BMP, and PDF."}
 
+@app.get("/cache/stats")
+def cache_stats():
+    return ocr_cache.stats()
+
+
+def file_kind(filename):
+    filename = filename.lower()
+    if filename.endswith((".jpg", ".jpeg", ".png", ".tiff", ".bmp")):
+        return "image"
+    if filename.endswith(".pdf"):
+        return "pdf"
+    return None
+
+
+async def extract_from_path(path, kind, file_digest, options):
+    cache_key = make_key(file_digest, ocr_settings(kind, options))
+    cached = ocr_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if kind == "image":
+        image = Image.open(path)
+        image.load()
+        text = (await ocr_pages([image], options))[0]
+    else:
+        text = join_pages(await ocr_pdf_path(path, options))
+
+    text = text.strip()
+    ocr_cache.put(cache_key, text)
+    return text
+
+
+def ndjson(data):
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+async def stream_pages(tmp, kind, file_digest, options):
+    """NDJSON con una línea por página en cuanto se reconoce y una línea final
+    con el resumen. Cierra (y borra) el fichero temporal al terminar."""
+    start = time.perf_counter()
+    try:
+        cache_key = make_key(file_digest, ocr_settings(kind, options))
+        cached = ocr_cache.get(cache_key)
+        if cached is not None:
+            pages = [(1, cached)] if kind == "image" else split_pages(cached)
+            for page, text in pages:
+                yield ndjson({"page": page, "text": text, "seconds": 0.0,
+                              "elapsed": round(time.perf_counter() - start, 3)})
+            yield ndjson({"done": True, "pages": len(pages), "cached": True,
+                          "elapsed": round(time.perf_counter() - start, 3)})
+            return
+
+        if kind == "image":
+            image = Image.open(tmp.name)
+            image.load()
+            results = iter_pages([image], options)
+        else:
+            results = iter_pdf_pages(tmp.name, options)
+
+        page_texts = []
+        async for page, text, seconds in results:
+            page_texts.append(text)
+            yield ndjson({"page": page, "text": text, "seconds": round(seconds, 3),
+                          "elapsed": round(time.perf_counter() - start, 3)})
+
+        text = page_texts[0] if kind == "image" else join_pages(page_texts)
+        ocr_cache.put(cache_key, text.strip())
+        yield ndjson({"done": True, "pages": len(page_texts), "cached": False,
+                      "elapsed": round(time.perf_counter() - start, 3)})
+
+    except UnidentifiedImageError:
+        yield ndjson({"error": "El archivo no es una imagen válida."})
+    except Exception as e:
+        yield ndjson({"error": f"Error procesando el archivo: {str(e)}"})
+    finally:
+        tmp.close()
+
+
 @app.post("/extract-text")
-async def extract_text(file: UploadFile = File(...)):
+async def extract_text(file: UploadFile = File(...),
+                       lang: Optional[str] = Form(None),
+                       psm: Optional[int] = Form(None),
+                       oem: Optional[int] = Form(None),
+                       stream: bool = False):
     try:
-        file_bytes = await file.read()
-        filename = file.filename.lower()
+        options = ocr_options(lang, psm, oem)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
 
-        if filename.endswith((".jpg", ".jpeg", ".png", ".tiff", ".bmp")):
-            image = Image.open(io.BytesIO(file_bytes))
-            text = pytesseract.image_to_string(image)
+    try:
+        kind = file_kind(file.filename)
+        if kind is None:
+            return JSONResponse(content={"error": UNSUPPORTED_FORMAT}, status_code=400)
 
-        elif filename.endswith(".pdf"):
-            images = convert_from_bytes(file_bytes)
-            text = ""
-            for i, img in enumerate(images):
-                page_text = pytesseract.image_to_string(img)
-                text += f"\n--- Página {i + 1} ---\n{page_text}"
+        # El archivo se copia por bloques a disco: nunca está entero en memoria
+        if stream:
+            # ?stream=true: NDJSON página a página (ver stream_pages)
+            tmp = spool_file(os.path.splitext(file.filename)[1])
+            try:
+                file_digest = await copy_upload(file, tmp)
+            except Exception:
+                tmp.close()
+                raise
+            return StreamingResponse(
+                stream_pages(tmp, kind, file_digest, options),
+                media_type="application/x-ndjson"
+            )
 
-        else:
-            return JSONResponse(
-                content={"error": "Formato no compatible. Solo se aceptan JPG, PNG, TIFF, BMP y PDF."},
-                status_code=400
+        with spool_file(os.path.splitext(file.filename)[1]) as tmp:
+            file_digest = await copy_upload(file, tmp)
+            text = await extract_from_path(tmp.name, kind, file_digest, options)
+        return JSONResponse(content={"extracted_text": text})
+
+    except UnidentifiedImageError:
+        return JSONResponse(
+            content={"error": "El archivo no es una imagen válida."},
+            status_code=400
+        )
+    except Exception as e:
+        return JSONResponse(
+            content={"error": f"Error procesando el archivo: {str(e)}"},
+            status_code=500
+        )
+
+
+@app.post("/extract-text-object")
+async def extract_text_object(ref: ObjectRef, stream: bool = False):
+    """OCR de un documento ya guardado en MinIO, a partir de su referencia."""
+    try:
+        options = ocr_options(ref.lang, ref.psm, ref.oem)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    try:
+        kind = file_kind(ref.object_name)
+        if kind is None:
+            return JSONResponse(content={"error": UNSUPPORTED_FORMAT}, status_code=400)
+
+        if stream:
+            tmp = spool_file(os.path.splitext(ref.object_name)[1])
+            try:
+                file_digest = await asyncio.to_thread(copy_object, ref.bucket, ref.object_name, tmp)
+            except Exception:
+                tmp.close()
+                raise
+            return StreamingResponse(
+                stream_pages(tmp, kind, file_digest, options),
+                media_type="application/x-ndjson"
             )
 
-        return JSONResponse(content={"extracted_text": text.strip()})
+        with spool_file(os.path.splitext(ref.object_name)[1]) as tmp:
+            file_digest = await asyncio.to_thread(copy_object, ref.bucket, ref.object_name, tmp)
+            text = await extract_from_path(tmp.name, kind, file_digest, options)
+        return JSONResponse(content={"extracted_text": text})
 
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchBucket"):
+            return JSONResponse(
+                content={"error": f"No existe el objeto {ref.bucket}/{ref.object_name}"},
+                status_code=404
+            )
+        return JSONResponse(
+            content={"error": f"Error leyendo el objeto de MinIO: {str(e)}"},
+            status_code=502
+        )
     except UnidentifiedImageError:
         return JSONResponse(
             content={"error": "El archivo no es una imagen válida."},
@@ -48,3 +234,95 @@ async def extract_text(file: UploadFile = File(...)):
         )
 
 
+@app.post("/extract-text-batch")
+async def extract_text_batch(request: Request):
+    """OCR de varios documentos en una sola petición.
+
+    Acepta un formulario multipart con varios campos "files" (y opcionalmente
+    lang/psm/oem) o un JSON {"objects": [{"object_name", "bucket"}], ...} con
+    referencias a MinIO. Responde NDJSON con una línea por documento, en el
+    orden en que terminan; "index" es su posición en la petición.
+    """
+    items = []
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            # El endpoint acepta también multipart, así que el cuerpo se valida
+            # aquí: un JSON que no es un objeto (lista, número...) es un 400
+            data = await request.json()
+            if not isinstance(data, dict):
+                raise ValueError("El cuerpo JSON debe ser un objeto con la lista 'objects'.")
+            batch = BatchRequest(**data)
+            options = ocr_options(batch.lang, batch.psm, batch.oem)
+            items = [("object_name", obj.object_name, obj) for obj in batch.objects]
+        else:
+            form = await request.form()
+            options = ocr_options(form.get("lang"), form.get("psm"), form.get("oem"))
+            items = [("filename", upload.filename, upload) for upload in form.getlist("files")]
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    if not items:
+        return JSONResponse(content={"error": "No se recibió ningún documento."}, status_code=400)
+    if len(items) > OCR_BATCH_MAX_FILES:
+        return JSONResponse(
+            content={"error": f"Como máximo {OCR_BATCH_MAX_FILES} documentos por petición."},
+            status_code=400
+        )
+
+    # Los archivos subidos se copian a disco antes de responder: el formulario
+    # se cierra al terminar la petición, antes de que acabe el streaming
+    spooled = {}
+    try:
+        for index, (field, name, source) in enumerate(items):
+            if field == "filename" and file_kind(name):
+                tmp = spool_file(os.path.splitext(name)[1])
+                spooled[index] = (tmp, None)
+                spooled[index] = (tmp, await copy_upload(source, tmp))
+    except Exception as e:
+        for tmp, _ in spooled.values():
+            tmp.close()
+        return JSONResponse(
+            content={"error": f"Error recibiendo los archivos: {str(e)}"},
+            status_code=500
+        )
+
+    semaphore = asyncio.Semaphore(OCR_BATCH_CONCURRENCY)
+
+    async def run(index, field, name, source):
+        result = {"index": index, field: name}
+        kind = file_kind(name)
+        if kind is None:
+            result["error"] = UNSUPPORTED_FORMAT
+            return result
+        async with semaphore:
+            try:
+                if index in spooled:
+                    tmp, file_digest = spooled[index]
+                    result["extracted_text"] = await extract_from_path(tmp.name, kind, file_digest, options)
+                else:
+                    with spool_file(os.path.splitext(name)[1]) as tmp:
+                        file_digest = await asyncio.to_thread(copy_object, source.bucket, name, tmp)
+                        result["extracted_text"] = await extract_from_path(tmp.name, kind, file_digest, options)
+            except S3Error as e:
+                result["error"] = f"Error leyendo el objeto de MinIO: {str(e)}"
+            except UnidentifiedImageError:
+                result["error"] = "El archivo no es una imagen válida."
+            except Exception as e:
+                result["error"] = f"Error procesando el archivo: {str(e)}"
+            finally:
+                if index in spooled:
+                    spooled.pop(index)[0].close()
+        return result
+
+    async def stream():
+        tasks = [asyncio.create_task(run(index, *item)) for index, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield ndjson(await next_done)
+        finally:
+            # Cliente desconectado: no se sigue haciendo OCR para nadie
+            for task in tasks:
+                task.cancel()
+            for tmp, _ in spooled.values():
+                tmp.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,145 @@
+# preprocess.py
+# Preprocesado de imágenes antes del OCR: escala de grises, reducción a un DPI
+# objetivo, corrección de inclinación, binarización y recorte de márgenes en
+# blanco. Las imágenes grandes y en color hacen a Tesseract lento (y a veces
+# menos preciso); todo se hace con operaciones vectorizadas de NumPy/PIL.
+import os
+import numpy as np
+from PIL import Image
+
+# Orden fijo de los pasos; OCR_PREPROCESS elige cuáles se aplican. Por
+# defecto ninguno, para no cambiar el texto ni el coste del OCR de quien no lo
+# pida; p. ej. OCR_PREPROCESS=grayscale,downscale,deskew,binarize,crop los
+# activa todos. Los pasos forman parte de la clave de la caché de OCR.
+PREPROCESS_STEPS = ("grayscale", "downscale", "deskew", "binarize", "crop")
+OCR_PREPROCESS = tuple(
+    step.strip() for step in os.getenv("OCR_PREPROCESS", "").split(",")
+    if step.strip()
+)
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 300))
+# Rango (en grados) y paso de la búsqueda de inclinación
+OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", 5))
+OCR_DESKEW_STEP = float(os.getenv("OCR_DESKEW_STEP", 0.5))
+OCR_CROP_PADDING = int(os.getenv("OCR_CROP_PADDING", 10))
+
+# La inclinación se estima sobre una miniatura de este ancho
+_DESKEW_WIDTH = 800
+
+_unknown = set(OCR_PREPROCESS) - set(PREPROCESS_STEPS)
+if _unknown:
+    raise ValueError(f"Pasos de preprocesado desconocidos: {', '.join(sorted(_unknown))}")
+
+
+def preprocess_settings():
+    # Forma parte de la clave de la caché de OCR
+    return {
+        "steps": [step for step in PREPROCESS_STEPS if step in OCR_PREPROCESS],
+        "target_dpi": OCR_TARGET_DPI,
+        "deskew_max_angle": OCR_DESKEW_MAX_ANGLE,
+        "deskew_step": OCR_DESKEW_STEP,
+        "crop_padding": OCR_CROP_PADDING,
+    }
+
+
+def otsu_threshold(gray):
+    """Umbral de Otsu de un array uint8: el nivel más alto de la clase oscura
+    (tinta = píxeles <= umbral)."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    sum_bg = np.cumsum(hist * levels)
+    mean_bg = sum_bg / np.maximum(weight_bg, 1)
+    mean_fg = (sum_bg[-1] - sum_bg) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def grayscale(image):
+    return image if image.mode == "L" else image.convert("L")
+
+
+def downscale(image, target_dpi=OCR_TARGET_DPI):
+    # Solo se reduce si la imagen declara un DPI mayor que el objetivo
+    dpi = image.info.get("dpi")
+    if not dpi or not dpi[0] or dpi[0] <= target_dpi:
+        return image
+    scale = target_dpi / float(dpi[0])
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    resized = image.resize(size, Image.LANCZOS)
+    resized.info["dpi"] = (target_dpi, target_dpi)
+    return resized
+
+
+def estimate_skew(gray, max_angle=OCR_DESKEW_MAX_ANGLE, step=OCR_DESKEW_STEP):
+    """Ángulo (grados) que deja las líneas de texto horizontales.
+
+    Perfil de proyección: con el ángulo correcto las sumas por fila alternan
+    entre líneas de texto y huecos, así que su varianza es máxima.
+    """
+    thumb = gray
+    if gray.width > _DESKEW_WIDTH:
+        ratio = _DESKEW_WIDTH / gray.width
+        thumb = gray.resize((_DESKEW_WIDTH, max(1, round(gray.height * ratio))), Image.BILINEAR)
+    pixels = np.asarray(thumb)
+    # Tinta = 255, fondo = 0, para que el relleno de la rotación no cuente
+    ink = Image.fromarray(((pixels <= otsu_threshold(pixels)) * 255).astype(np.uint8))
+
+    # Se prueban primero los ángulos pequeños: en caso de empate (p. ej. una
+    # página en blanco) gana el menor giro
+    angles = sorted(np.arange(-max_angle, max_angle + step / 2, step), key=abs)
+    best_angle, best_score = 0.0, -1.0
+    for angle in angles:
+        rotated = np.asarray(ink.rotate(float(angle), resample=Image.NEAREST), dtype=np.float64)
+        score = rotated.sum(axis=1).var()
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def deskew(image):
+    angle = estimate_skew(grayscale(image))
+    if abs(angle) < 1e-6:
+        return image
+    bands = len(image.getbands())
+    fill = 255 if bands == 1 else (255,) * bands
+    return image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+
+
+def binarize(image):
+    pixels = np.asarray(grayscale(image))
+    binary = np.where(pixels > otsu_threshold(pixels), 255, 0).astype(np.uint8)
+    return Image.fromarray(binary)
+
+
+def crop_margins(image, padding=OCR_CROP_PADDING):
+    pixels = np.asarray(grayscale(image))
+    ink = pixels <= otsu_threshold(pixels)
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return image  # página en blanco
+    box = (
+        max(0, int(cols[0]) - padding),
+        max(0, int(rows[0]) - padding),
+        min(image.width, int(cols[-1]) + padding + 1),
+        min(image.height, int(rows[-1]) + padding + 1),
+    )
+    return image.crop(box)
+
+
+_STEP_FUNCTIONS = {
+    "grayscale": grayscale,
+    "downscale": downscale,
+    "deskew": deskew,
+    "binarize": binarize,
+    "crop": crop_margins,
+}
+
+
+def preprocess_image(image, steps=OCR_PREPROCESS):
+    """Aplica los pasos indicados, siempre en el orden de PREPROCESS_STEPS."""
+    for step in PREPROCESS_STEPS:
+        if step in steps:
+            image = _STEP_FUNCTIONS[step](image)
+    return image
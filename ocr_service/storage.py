@@ -0,0 +1,63 @@
+# storage.py
+# Lectura en streaming de documentos: los archivos (subidos o guardados en
+# MinIO) se copian por bloques a un fichero temporal calculando su SHA-256 a
+# la vez, así la memoria por petición depende de OCR_CHUNK_SIZE y no del
+# tamaño del documento.
+import os
+import hashlib
+import tempfile
+from minio import Minio
+
+MINIO_ENDPOINT = os.getenv("MINIO_HOST", "minio:9000")
+MINIO_ACCESS_KEY = os.getenv("MINIO_ROOT_USER", "admin")
+MINIO_SECRET_KEY = os.getenv("MINIO_ROOT_PASSWORD", "admin123")
+MINIO_BUCKET_INCOMING = os.getenv("MINIO_BUCKET_INCOMING", "incoming-docs")
+
+OCR_CHUNK_SIZE = int(os.getenv("OCR_CHUNK_SIZE", 1024 * 1024))
+
+_minio_client = None
+
+
+def get_minio_client():
+    global _minio_client
+    if _minio_client is None:
+        _minio_client = Minio(
+            MINIO_ENDPOINT.replace("http://", "").replace("https://", ""),
+            access_key=MINIO_ACCESS_KEY,
+            secret_key=MINIO_SECRET_KEY,
+            secure=False
+        )
+    return _minio_client
+
+
+def spool_file(suffix=""):
+    # poppler y PIL necesitan un fichero con nombre; se borra al cerrarlo
+    return tempfile.NamedTemporaryFile(suffix=suffix)
+
+
+async def copy_upload(upload, dest):
+    """Copia un UploadFile a dest por bloques y devuelve el SHA-256 (hex)."""
+    digest = hashlib.sha256()
+    while True:
+        chunk = await upload.read(OCR_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        dest.write(chunk)
+    dest.flush()
+    return digest.hexdigest()
+
+
+def copy_object(bucket, object_name, dest):
+    """Descarga un objeto de MinIO a dest por bloques y devuelve el SHA-256 (hex)."""
+    digest = hashlib.sha256()
+    data = get_minio_client().get_object(bucket, object_name)
+    try:
+        for chunk in data.stream(OCR_CHUNK_SIZE):
+            digest.update(chunk)
+            dest.write(chunk)
+    finally:
+        data.close()
+        data.release_conn()
+    dest.flush()
+    return digest.hexdigest()
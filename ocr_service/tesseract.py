@@ -0,0 +1,114 @@
+# tesseract.py
+# Motores de Tesseract. pytesseract lanza un proceso `tesseract` y escribe
+# ficheros temporales en cada página, recargando el modelo de idioma cada vez;
+# con tesserocr (binding de la API de C++) cada worker del pool mantiene sus
+# modelos cargados entre páginas. Si tesserocr no está instalado se usa
+# pytesseract.
+import os
+import re
+import threading
+from collections import OrderedDict
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# auto = tesserocr si está disponible, si no pytesseract
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_PSM = int(os.getenv("OCR_PSM", 3))
+OCR_OEM = int(os.getenv("OCR_OEM", 3))
+# Modelos (lang, psm, oem) que cada worker mantiene cargados a la vez
+OCR_MAX_MODELS = int(os.getenv("OCR_MAX_MODELS", 4))
+TESSDATA_PREFIX = os.getenv("TESSDATA_PREFIX")
+
+_LANG_RE = re.compile(r"^[A-Za-z_]+(\+[A-Za-z_]+)*$")
+
+
+def ocr_options(lang=None, psm=None, oem=None):
+    """Opciones de Tesseract de una petición, con los valores por defecto del servicio."""
+    options = {
+        "lang": lang or OCR_LANG,
+        "psm": OCR_PSM if psm is None else int(psm),
+        "oem": OCR_OEM if oem is None else int(oem),
+    }
+    if not _LANG_RE.match(options["lang"]):
+        raise ValueError(f"Idioma no válido: {options['lang']}")
+    if not 0 <= options["psm"] <= 13:
+        raise ValueError("psm debe estar entre 0 y 13")
+    if not 0 <= options["oem"] <= 3:
+        raise ValueError("oem debe estar entre 0 y 3")
+    return options
+
+
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def image_to_string(self, image, lang, psm, oem):
+        return pytesseract.image_to_string(image, lang=lang, config=f"--psm {psm} --oem {oem}")
+
+    def load(self, lang, psm, oem):
+        # El binario de tesseract carga el modelo en cada llamada
+        pass
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """Una instancia de PyTessBaseAPI por combinación (lang, psm, oem), reutilizada."""
+    name = "tesserocr"
+
+    def __init__(self, max_models=OCR_MAX_MODELS):
+        self.max_models = max_models
+        self._apis = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _api(self, lang, psm, oem):
+        key = (lang, psm, oem)
+        api = self._apis.get(key)
+        if api is not None:
+            self._apis.move_to_end(key)
+            return api
+        kwargs = {"lang": lang, "psm": psm, "oem": oem}
+        if TESSDATA_PREFIX:
+            kwargs["path"] = TESSDATA_PREFIX
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        self._apis[key] = api
+        while len(self._apis) > self.max_models:
+            _, old = self._apis.popitem(last=False)
+            old.End()
+        return api
+
+    def load(self, lang, psm, oem):
+        with self._lock:
+            self._api(lang, psm, oem)
+
+    def image_to_string(self, image, lang, psm, oem):
+        with self._lock:
+            api = self._api(lang, psm, oem)
+            api.SetImage(image)
+            try:
+                return api.GetUTF8Text()
+            finally:
+                api.Clear()
+
+    def close(self):
+        with self._lock:
+            for api in self._apis.values():
+                api.End()
+            self._apis.clear()
+
+
+def create_engine(backend=OCR_BACKEND):
+    if backend == "pytesseract":
+        return PytesseractEngine()
+    if backend not in ("auto", "tesserocr"):
+        raise ValueError(f"OCR_BACKEND desconocido: {backend}")
+    if tesserocr is None:
+        if backend == "tesserocr":
+            raise RuntimeError("OCR_BACKEND=tesserocr pero tesserocr no está instalado")
+        return PytesseractEngine()
+    return TesserocrEngine()
@@ -0,0 +1,28 @@
+# test_batch_request.py
+import pytest
+from fastapi.testclient import TestClient
+
+import ocr
+
+# Sin "with": no se arranca el pool de OCR
+client = TestClient(ocr.app)
+
+
+@pytest.mark.parametrize("body", ["[]", "[1, 2]", "42", '"objects"', "null", "{no es json"])
+def test_non_object_json_body_is_400(body):
+    resp = client.post("/extract-text-batch", content=body,
+                       headers={"content-type": "application/json"})
+    assert resp.status_code == 400
+    assert "error" in resp.json()
+
+
+@pytest.mark.parametrize("body", [{}, {"objects": "a.pdf"}, {"objects": [{"bucket": "b"}]}])
+def test_invalid_batch_request_is_400(body):
+    resp = client.post("/extract-text-batch", json=body)
+    assert resp.status_code == 400
+
+
+def test_empty_batch_is_400():
+    resp = client.post("/extract-text-batch", json={"objects": []})
+    assert resp.status_code == 400
+    assert resp.json() == {"error": "No se recibió ningún documento."}
@@ -0,0 +1,66 @@
+# normalization.py
+# Normalización de texto del pipeline del dataset. Misma salida que el
+# clean_text original — minúsculas, sin tildes ni diacríticos, solo
+# letras/dígitos ASCII y un espacio entre palabras — pero con una tabla de
+# traducción por carácter en lugar de un generador con unicodedata y dos
+# pasadas de regex.
+import re
+import unicodedata
+
+_NOT_ALLOWED = re.compile(r"[^a-zA-Z0-9áéíóúñü\s]")
+
+# Separador de normalize_many: se traduce a sí mismo y luego se corta por él
+_SEPARATOR = "\x00"
+
+
+def _translate_char(char):
+    """Lo que clean_text hace con un carácter, sin colapsar espacios.
+
+    Las transformaciones de clean_text actúan carácter a carácter: el único
+    caso dependiente del contexto (sigma final de lower()) y la reordenación
+    canónica de NFD solo afectan a caracteres que acaban borrados o como
+    espacio, así que aplicarlas por separado da el mismo resultado.
+    """
+    decomposed = unicodedata.normalize("NFD", char.lower())
+    stripped = "".join(c for c in decomposed if unicodedata.category(c) != "Mn")
+    return _NOT_ALLOWED.sub(" ", stripped)
+
+
+class _TranslationTable(dict):
+    """Tabla para str.translate que calcula (y guarda) cada carácter la
+    primera vez que aparece; el rango latino se calcula al importar."""
+
+    def __missing__(self, codepoint):
+        value = _translate_char(chr(codepoint))
+        self[codepoint] = value
+        return value
+
+
+_TABLE = _TranslationTable()
+for _codepoint in range(0x250):
+    _TABLE[_codepoint] = _translate_char(chr(_codepoint))
+
+_BATCH_TABLE = _TranslationTable(_TABLE)
+_BATCH_TABLE[ord(_SEPARATOR)] = _SEPARATOR
+
+
+def normalize_text(text):
+    # split() sin argumentos corta por los mismos espacios que \s y descarta
+    # los de los extremos: equivale a re.sub(r"\s+", " ", ...).strip()
+    return " ".join(text.translate(_TABLE).split())
+
+
+def normalize_many(texts):
+    """Normaliza muchos textos con una sola llamada a str.translate."""
+    texts = list(texts)
+    if not texts:
+        # "".split(_SEPARATOR) daría [""]
+        return []
+    if any(_SEPARATOR in text for text in texts):
+        return [normalize_text(text) for text in texts]
+    joined = _SEPARATOR.join(texts).translate(_BATCH_TABLE)
+    return [" ".join(part.split()) for part in joined.split(_SEPARATOR)]
+
+
+# Nombre anterior, usado por los scripts existentes
+clean_text = normalize_text
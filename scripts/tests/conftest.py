@@ -0,0 +1,6 @@
+# conftest.py
+# Los scripts se importan como al ejecutarlos, desde su carpeta
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,50 @@
+# test_normalization.py
+import re
+import unicodedata
+
+import pytest
+
+from normalization import clean_text, normalize_many, normalize_text
+
+
+def original_clean_text(text):
+    # clean_text anterior a la tabla de traducción, como referencia
+    text = text.lower()
+    text = "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+    text = re.sub(r"[^a-zA-Z0-9áéíóúñü\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+SAMPLES = [
+    "",
+    "   ",
+    "Hola, MUNDO!",
+    "Canción   del\tniño\n\nPingüino",
+    "Factura Nº 123/2024 — importe: 1.500,00 €",
+    "ΣΟΦΟΣ σοφος",
+    "ﬁcha técnica",
+    "naïve café Ångström",
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_matches_original_clean_text(text):
+    assert normalize_text(text) == original_clean_text(text)
+
+
+def test_clean_text_alias():
+    assert clean_text is normalize_text
+
+
+def test_normalize_many_matches_normalize_text():
+    assert normalize_many(SAMPLES) == [normalize_text(text) for text in SAMPLES]
+
+
+def test_normalize_many_empty():
+    assert normalize_many([]) == []
+    assert normalize_many(iter(())) == []
+
+
+def test_normalize_many_text_with_separator():
+    texts = ["a\x00b", "Ñandú"]
+    assert normalize_many(texts) == [normalize_text(text) for text in texts]
@@ -0,0 +1,47 @@
+# test_txt_to_dataset_ready.py
+import csv
+import os
+import sys
+
+import txt_to_dataset_ready
+
+
+def make_dataset(root, counts):
+    for categoria, count in counts.items():
+        os.makedirs(root / categoria)
+        for i in range(count):
+            (root / categoria / f"doc{i}.txt").write_text(f"texto {categoria} {i}", encoding="utf-8")
+
+
+def run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["txt_to_dataset_ready.py", *argv])
+    txt_to_dataset_ready.main()
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_shards_keep_file_order(tmp_path, monkeypatch):
+    make_dataset(tmp_path, {"a": 3, "b": 2})
+    run(monkeypatch, "--dataset", str(tmp_path), "--workers", "3", "--shard-size", "2", "--separate-texts")
+
+    assert txt_to_dataset_ready.list_shards(tmp_path / "manifest", "csv") == [
+        "part-00000.csv", "part-00001.csv", "part-00002.csv"]
+    merged = read_csv(tmp_path / "dataset_ready.csv")
+    assert merged[0] == txt_to_dataset_ready.manifest_columns(True)
+    ids = [row[3] for row in merged[1:]]
+    assert ids == [texto_id for texto_id in ("a/doc0", "a/doc1", "a/doc2", "b/doc0", "b/doc1")
+                   for _ in txt_to_dataset_ready.OUTPUT_FORMATS]
+    assert read_csv(tmp_path / "textos" / "part-00002.csv") == [
+        ["texto_id", "texto_limpio"], ["b/doc1", "texto b 1"]]
+
+
+def test_rerun_with_larger_shards_removes_stale_shards(tmp_path, monkeypatch):
+    make_dataset(tmp_path, {"a": 3})
+    run(monkeypatch, "--dataset", str(tmp_path), "--workers", "2", "--shard-size", "1")
+    run(monkeypatch, "--dataset", str(tmp_path), "--workers", "2")
+
+    assert txt_to_dataset_ready.list_shards(tmp_path / "manifest", "csv") == ["part-00000.csv"]
+    assert len(read_csv(tmp_path / "dataset_ready.csv")) == 1 + 3 * len(txt_to_dataset_ready.OUTPUT_FORMATS)
@@ -1,10 +1,19 @@
 import os
 import csv
-import re
-import unicodedata
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from fpdf import FPDF
 from PIL import Image, ImageDraw, ImageFont
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from normalization import clean_text
+
 # -------------------
 # CONFIGURACIÓN
 # -------------------
@@ -18,25 +27,59 @@ IMAGE_HEIGHT = 1754  # px (aprox A4)
 MARGIN = 50  # px
 LINE_SPACING = 4  # px entre líneas
 
-CSV_PATH = os.path.join(DATASET_FOLDER, "dataset_ready.csv")
+# Procesos que generan el dataset en paralelo
+WORKERS = os.cpu_count() or 1
+# Archivos .txt por fragmento del manifiesto (manifest/part-NNNNN.csv)
+SHARD_SIZE = 500
+# Páginas de imagen como máximo por documento
+MAX_PAGES = 50
 
 # -------------------
 # FUNCIONES
 # -------------------
-def clean_text(text):
-    text = text.lower()
-    text = ''.join(
-        c for c in unicodedata.normalize('NFD', text)
-        if unicodedata.category(c) != 'Mn'
-    )
-    text = re.sub(r"[^a-zA-Z0-9áéíóúñü\s]", " ", text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
-def txt_to_pdf(txt_path, pdf_path):
-    with open(txt_path, "r", encoding="utf-8") as f:
-        text = f.read()
+# Fuente y anchos de palabra cacheados por proceso: se cargan una vez por
+# worker, no una vez por imagen
+_font = None
+_word_widths = {}
+
+def get_font():
+    global _font
+    if _font is None:
+        if FONT_PATH:
+            _font = ImageFont.truetype(FONT_PATH, FONT_SIZE)
+        else:
+            _font = ImageFont.load_default()
+    return _font
+
+def word_width(word):
+    width = _word_widths.get(word)
+    if width is None:
+        width = get_font().getlength(word)
+        _word_widths[word] = width
+    return width
 
+def wrap_line(line, max_width):
+    """Parte una línea en trozos que caben en max_width.
+
+    El ancho se acumula palabra a palabra (ancho de la palabra + espacio) en
+    lugar de volver a medir la línea entera con cada palabra nueva.
+    """
+    space = word_width(" ")
+    current = []
+    current_width = 0.0
+    for word in line.split():
+        width = word_width(word)
+        new_width = width if not current else current_width + space + width
+        if current and new_width > max_width:
+            yield " ".join(current)
+            current = [word]
+            current_width = width
+        else:
+            current.append(word)
+            current_width = new_width
+    yield " ".join(current)
+
+def txt_to_pdf(text, pdf_path):
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -47,82 +90,262 @@ def txt_to_pdf(txt_path, pdf_path):
         pdf.multi_cell(0, 5, line)
     pdf.output(pdf_path)
 
-def txt_to_image(txt_path, image_path, image_format="PNG"):
-    with open(txt_path, "r", encoding="utf-8") as f:
-        text = f.read()
+def render_text_pages(text, max_pages=MAX_PAGES):
+    """Renderiza el texto en tantas páginas como haga falta (hasta max_pages)."""
+    font = get_font()
+    pages = []
+    draw = None
+    y_text = IMAGE_HEIGHT  # fuerza una página nueva con la primera línea
 
-    img = Image.new("RGB", (IMAGE_WIDTH, IMAGE_HEIGHT), color="white")
-    draw = ImageDraw.Draw(img)
-
-    if FONT_PATH:
-        font = ImageFont.truetype(FONT_PATH, FONT_SIZE)
-    else:
-        font = ImageFont.load_default()
-
-    y_text = MARGIN
     for line in text.split("\n"):
-        words = line.split()
-        current_line = ""
-        for word in words:
-            test_line = current_line + " " + word if current_line else word
-            bbox = draw.textbbox((0,0), test_line, font=font)
-            width = bbox[2] - bbox[0]
-            if width + 2*MARGIN > IMAGE_WIDTH:
-                draw.text((MARGIN, y_text), current_line, fill="black", font=font)
-                y_text += FONT_SIZE + LINE_SPACING
-                current_line = word
-                if y_text > IMAGE_HEIGHT - MARGIN:
-                    break
-            else:
-                current_line = test_line
-        if y_text > IMAGE_HEIGHT - MARGIN:
-            break
-        draw.text((MARGIN, y_text), current_line, fill="black", font=font)
-        y_text += FONT_SIZE + LINE_SPACING
-        if y_text > IMAGE_HEIGHT - MARGIN:
-            break
+        for chunk in wrap_line(line, IMAGE_WIDTH - 2 * MARGIN):
+            if y_text > IMAGE_HEIGHT - MARGIN:
+                if len(pages) == max_pages:
+                    print(f"Aviso: texto truncado a {max_pages} páginas")
+                    return pages
+                img = Image.new("RGB", (IMAGE_WIDTH, IMAGE_HEIGHT), color="white")
+                draw = ImageDraw.Draw(img)
+                pages.append(img)
+                y_text = MARGIN
+            draw.text((MARGIN, y_text), chunk, fill="black", font=font)
+            y_text += FONT_SIZE + LINE_SPACING
+    return pages
+
+def image_path(category_path, base_name, fmt, page=1):
+    # La primera página conserva el nombre de siempre; las demás llevan _pN
+    suffix = "" if page == 1 else f"_p{page}"
+    return os.path.join(category_path, f"{base_name}{suffix}.{fmt}")
 
+def save_pages(pages, category_path, base_name, fmt):
+    """Guarda las páginas: TIFF en un solo archivo multipágina, PNG/JPG en uno por página."""
     # Ajuste para Pillow: jpg → JPEG
-    save_format = "JPEG" if image_format.upper() == "JPG" else image_format
-    img.save(image_path, format=save_format)
-
-def process_category(category_path, csv_writer):
-    for filename in os.listdir(category_path):
-        if not filename.endswith(".txt"):
-            continue
-        txt_path = os.path.join(category_path, filename)
-        base_name = os.path.splitext(filename)[0]
-
-        with open(txt_path, "r", encoding="utf-8") as f:
-            raw_text = f.read()
-        clean_txt = clean_text(raw_text)
-
-        for fmt in OUTPUT_FORMATS:
-            output_file = os.path.join(category_path, f"{base_name}.{fmt}")
-            if os.path.exists(output_file):
-                continue
+    save_format = "JPEG" if fmt.upper() == "JPG" else fmt.upper()
+    for img in pages:
+        # Las mismas imágenes se guardan en varios formatos y el guardado en
+        # PNG deja su configuración de codificador en la imagen (el TIFF
+        # multipágina falla al heredarla)
+        img.encoderconfig = ()
+    if fmt == "tiff":
+        pages[0].save(image_path(category_path, base_name, fmt), format=save_format,
+                      save_all=True, append_images=pages[1:])
+        return 1
+    for page, img in enumerate(pages, start=1):
+        img.save(image_path(category_path, base_name, fmt, page), format=save_format)
+    return len(pages)
+
+def existing_pages(category_path, base_name, fmt):
+    # Páginas ya generadas en una ejecución anterior
+    page = 1
+    while os.path.exists(image_path(category_path, base_name, fmt, page + 1)):
+        page += 1
+    return page
+
+def process_file(category_path, filename, separate_texts=False):
+    """Genera los formatos que falten de un .txt.
+
+    Devuelve las filas del manifiesto (una por archivo de salida), la fila de
+    texto si se guarda aparte y el número de archivos nuevos.
+    """
+    txt_path = os.path.join(category_path, filename)
+    base_name = os.path.splitext(filename)[0]
+    categoria = os.path.basename(category_path)
+
+    with open(txt_path, "r", encoding="utf-8") as f:
+        raw_text = f.read()
+    clean_txt = clean_text(raw_text)
+    texto_id = f"{categoria}/{base_name}"
+    texto = texto_id if separate_texts else clean_txt
+
+    rows = []
+    generated = 0
+    pages = None
+    for fmt in OUTPUT_FORMATS:
+        first_file = image_path(category_path, base_name, fmt)
+        if not os.path.exists(first_file):
             if fmt == "pdf":
-                txt_to_pdf(txt_path, output_file)
+                txt_to_pdf(raw_text, first_file)
+                generated += 1
             else:
-                txt_to_image(txt_path, output_file, fmt.upper())
+                # Una sola renderización para PNG, TIFF y JPG
+                if pages is None:
+                    pages = render_text_pages(raw_text) or [
+                        Image.new("RGB", (IMAGE_WIDTH, IMAGE_HEIGHT), color="white")
+                    ]
+                generated += save_pages(pages, category_path, base_name, fmt)
 
-            # Guardar info en CSV
-            csv_writer.writerow([f"{base_name}.{fmt}", os.path.abspath(output_file), os.path.basename(category_path), clean_txt])
+        if fmt in ("pdf", "tiff"):
+            # Un solo archivo con todas las páginas
+            files = [(first_file, None)]
+        else:
+            count = existing_pages(category_path, base_name, fmt)
+            files = [(image_path(category_path, base_name, fmt, page), page) for page in range(1, count + 1)]
+
+        for path, page in files:
+            rows.append([os.path.basename(path), os.path.abspath(path), categoria, texto, page])
+
+    text_row = [texto_id, clean_txt] if separate_texts else None
+    return rows, text_row, generated
+
+# -------------------
+# MANIFIESTOS
+# -------------------
+# Cada bloque de SHARD_SIZE .txt (en orden) va a su propio fragmento
+# part-NNNNN, que se pueden añadir o regenerar por separado y merge_manifests
+# une. Los workers procesan archivo a archivo y el proceso principal escribe
+# cada fragmento al tener todos sus archivos: el paralelismo no depende del
+# tamaño del fragmento.
+# pagina va al final para que las cuatro columnas originales de
+# dataset_ready.csv no cambien de posición
+def manifest_columns(separate_texts):
+    return ["archivo", "ruta", "categoria", "texto_id" if separate_texts else "texto_limpio", "pagina"]
+
+def shard_name(index, fmt):
+    return f"part-{index:05d}.{fmt}"
+
+def write_table(path, columns, rows, fmt):
+    # Se escribe a un temporal y se renombra: un fragmento nunca queda a medias
+    tmp_path = path + ".tmp"
+    if fmt == "parquet":
+        # Esquema fijo: todos los fragmentos deben coincidir para poder unirlos
+        schema = pa.schema([(col, pa.int64() if col == "pagina" else pa.string()) for col in columns])
+        table = pa.table({col: [row[i] for row in rows] for i, col in enumerate(columns)}, schema=schema)
+        pq.write_table(table, tmp_path)
+    else:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+def write_shard(index, results, output_dir, fmt, separate_texts):
+    """Escribe el fragmento a partir de los resultados de process_file, en orden."""
+    rows = [row for file_rows, _ in results for row in file_rows]
+    write_table(os.path.join(output_dir, "manifest", shard_name(index, fmt)),
+                manifest_columns(separate_texts), rows, fmt)
+    if separate_texts:
+        text_rows = [text_row for _, text_row in results if text_row]
+        write_table(os.path.join(output_dir, "textos", shard_name(index, fmt)),
+                    ["texto_id", "texto_limpio"], text_rows, fmt)
+    return len(rows)
+
+def list_shards(folder, fmt):
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name for name in os.listdir(folder)
+                  if name.startswith("part-") and name.endswith(f".{fmt}"))
+
+def remove_stale_shards(folder, fmt, shard_count):
+    # Fragmentos de ejecuciones anteriores con más archivos
+    for name in list_shards(folder, fmt):
+        if int(name[len("part-"):].split(".")[0]) >= shard_count:
+            os.remove(os.path.join(folder, name))
+
+def merge_manifests(folder, out_path, fmt):
+    """Une los fragmentos en un solo archivo, en orden y fragmento a fragmento."""
+    shards = [os.path.join(folder, name) for name in list_shards(folder, fmt)]
+    tmp_path = out_path + ".tmp"
+    if fmt == "parquet":
+        writer = None
+        for shard in shards:
+            table = pq.read_table(shard)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+        if writer is None:
+            return
+        writer.close()
+    else:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+            for i, shard in enumerate(shards):
+                with open(shard, "r", newline="", encoding="utf-8") as f:
+                    header = f.readline()
+                    if i == 0:
+                        out.write(header)
+                    for line in f:
+                        out.write(line)
+    os.replace(tmp_path, out_path)
+
+def list_files(dataset_folder):
+    categories = sorted(d for d in os.listdir(dataset_folder)
+                        if os.path.isdir(os.path.join(dataset_folder, d))
+                        and d not in ("manifest", "textos"))
+    for cat in categories:
+        cat_path = os.path.join(dataset_folder, cat)
+        for filename in sorted(os.listdir(cat_path)):
+            if filename.endswith(".txt"):
+                yield cat_path, filename
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Genera PDF e imágenes del dataset a partir de los .txt")
+    parser.add_argument("--dataset", default=DATASET_FOLDER)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE,
+                        help="Archivos .txt por fragmento del manifiesto")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv",
+                        help="Formato de los manifiestos (parquet requiere pyarrow)")
+    parser.add_argument("--separate-texts", action="store_true",
+                        help="Guarda texto_limpio en textos/ y deja en el manifiesto solo su texto_id")
+    parser.add_argument("--no-merge", action="store_true",
+                        help="No une los fragmentos en dataset_ready.<formato> al terminar")
+    return parser.parse_args()
 
 def main():
-    categories = [d for d in os.listdir(DATASET_FOLDER)
-                  if os.path.isdir(os.path.join(DATASET_FOLDER, d))]
+    args = parse_args()
+    if args.format == "parquet" and pa is None:
+        raise SystemExit("--format parquet requiere pyarrow (pip install pyarrow)")
+
+    files = list(list_files(args.dataset))
+    shard_count = (len(files) + args.shard_size - 1) // args.shard_size
+    for folder in ("manifest", "textos") if args.separate_texts else ("manifest",):
+        os.makedirs(os.path.join(args.dataset, folder), exist_ok=True)
+        remove_stale_shards(os.path.join(args.dataset, folder), args.format, shard_count)
+
+    start = time.monotonic()
+    processed = 0
+    manifest_rows = 0
+    generated = 0
+    # Resultados por fragmento hasta tener todos sus archivos: {fragmento: {posición: (filas, texto)}}
+    pending = {}
+    in_flight = {}
+
+    def collect(finished):
+        nonlocal processed, manifest_rows, generated
+        for future in finished:
+            shard, pos = divmod(in_flight.pop(future), args.shard_size)
+            file_rows, text_row, file_generated = future.result()
+            generated += file_generated
+            processed += 1
+            results = pending.setdefault(shard, {})
+            results[pos] = (file_rows, text_row)
+            if len(results) == min(args.shard_size, len(files) - shard * args.shard_size):
+                del pending[shard]
+                manifest_rows += write_shard(shard, [results[i] for i in range(len(results))],
+                                             args.dataset, args.format, args.separate_texts)
+                print(f"Procesados {processed}/{len(files)} archivos .txt")
 
-    with open(CSV_PATH, "w", newline="", encoding="utf-8") as csvfile:
-        csv_writer = csv.writer(csvfile)
-        csv_writer.writerow(["archivo", "ruta", "categoria", "texto_limpio"])
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # Los archivos se envían en orden y con pocos en vuelo: solo quedan en
+        # memoria los resultados de los fragmentos a medias
+        for index, (category_path, filename) in enumerate(files):
+            while len(in_flight) >= args.workers * 4:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+            future = executor.submit(process_file, category_path, filename, args.separate_texts)
+            in_flight[future] = index
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(finished)
 
-        for cat in categories:
-            cat_path = os.path.join(DATASET_FOLDER, cat)
-            print(f"Procesando categoría: {cat}")
-            process_category(cat_path, csv_writer)
+    if not args.no_merge:
+        out_path = os.path.join(args.dataset, f"dataset_ready.{args.format}")
+        merge_manifests(os.path.join(args.dataset, "manifest"), out_path, args.format)
+        print(f"Manifiesto unido en {out_path}")
 
-    print(f"¡Conversión completada! CSV listo en {CSV_PATH}")
+    elapsed = time.monotonic() - start
+    print(f"¡Conversión completada! {shard_count} fragmentos en {os.path.join(args.dataset, 'manifest')}")
+    print(f"Archivos .txt: {len(files)}  filas del manifiesto: {manifest_rows}  archivos generados: {generated}  "
+          f"tiempo: {elapsed:.1f}s  ({len(files) / elapsed if elapsed else 0:.1f} txt/s, "
+          f"{generated / elapsed if elapsed else 0:.1f} archivos/s, workers={args.workers})")
 
 if __name__ == "__main__":
     main()